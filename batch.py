@@ -0,0 +1,126 @@
+'''
+Batch runner: runs many scripts on a pool of processes and reports the
+result, error, printed output and time of each one.
+
+    python3 batch.py <directory or manifest> [--workers N] [--engine tree]
+                     [--optimize 0] [--pattern *] [--json report.json]
+
+A manifest is a text file with one script path per line, relative to the
+manifest. Blank lines and lines starting with # are skipped.
+'''
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import my_own
+
+
+### SCRIPTS ###
+
+def collect_scripts(target, pattern='*'):
+    '''The files matching pattern in directory target, or the paths listed in the manifest target'''
+    if os.path.isdir(target):
+        paths = glob.glob(os.path.join(target, pattern))
+        return sorted(path for path in paths if os.path.isfile(path))
+
+    base = os.path.dirname(target)
+    with open(target, encoding='utf-8') as manifest:
+        lines = (line.strip() for line in manifest)
+        return [os.path.join(base, line) for line in lines if line and not line.startswith('#')]
+
+
+### WORKER ###
+
+def run_script(path, engine='tree', optimize=0):
+    '''
+    Runs path in its own globals, nothing is left for the next script of the
+    worker. Anything going wrong is reported, not raised
+    '''
+    output = io.StringIO()
+    result = error = None
+
+    start = time.perf_counter()
+    try:
+        # The batch already uses every worker, parallel_map runs in process
+        with contextlib.redirect_stdout(output):
+            value, run_error = my_own.run_file(path, engine=engine, optimize=optimize, workers=1)
+        if run_error: error = run_error.as_string()
+        else: result = repr(value)
+    except Exception as exception:
+        # Python errors (unreadable files, input() without stdin, recursion...)
+        error = f'{type(exception).__name__}: {exception}'
+    seconds = time.perf_counter() - start
+
+    return {
+        'path':    path,
+        'result':  result,
+        'error':   error,
+        'output':  output.getvalue(),
+        'seconds': seconds,
+    }
+
+
+### BATCH ###
+
+def run_batch(paths, workers=None, engine='tree', optimize=0):
+    '''
+    Runs every script in paths, workers processes at a time (None = one per
+    cpu, 1 = in this process). The report has one entry per script, in order
+    '''
+    workers = workers or os.cpu_count() or 1
+    engines, optimizations = [engine] * len(paths), [optimize] * len(paths)
+
+    start = time.perf_counter()
+    if workers <= 1:
+        scripts = list(map(run_script, paths, engines, optimizations))
+    else:
+        chunksize = max(1, len(paths) // (workers * 8))
+        with ProcessPoolExecutor(workers) as pool:
+            scripts = list(pool.map(run_script, paths, engines, optimizations, chunksize=chunksize))
+    seconds = time.perf_counter() - start
+
+    failed = sum(1 for script in scripts if script['error'] is not None)
+    return {
+        'workers': workers,
+        'seconds': seconds,
+        'passed':  len(scripts) - failed,
+        'failed':  failed,
+        'scripts': scripts,
+    }
+
+
+### CLI ###
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run many scripts on a process pool')
+    parser.add_argument('target', help='directory of scripts or manifest file')
+    parser.add_argument('--workers',  type=int, default=None, help='processes (default: one per cpu)')
+    parser.add_argument('--engine',   default='tree', choices=my_own.ENGINES)
+    parser.add_argument('--optimize', type=int, default=0)
+    parser.add_argument('--pattern',  default='*', help='files to run in a directory')
+    parser.add_argument('--json',     help='write the full report to this file')
+    args = parser.parse_args(argv)
+
+    paths = collect_scripts(args.target, args.pattern)
+    report = run_batch(paths, args.workers, args.engine, args.optimize)
+
+    for script in report['scripts']:
+        if script['error'] is not None:
+            print(f"FAIL {script['path']} ({script['seconds']:.3f}s)\n{script['error']}\n")
+    print(f"{report['passed']} passed, {report['failed']} failed, "
+          f"{len(paths)} scripts in {report['seconds']:.2f}s on {report['workers']} workers")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=2)
+    return 1 if report['failed'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
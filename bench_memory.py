@@ -0,0 +1,64 @@
+'''
+Memory benchmark: bytes per token and bytes per AST node for a large
+generated program.
+
+    python3 bench_memory.py [terms]
+'''
+import sys
+import tracemalloc
+
+from classes.lexer  import Lexer
+from classes.parser import Parser
+from classes.node   import *
+
+
+def generate_source(terms):
+    parts = []
+    for i in range(terms):
+        parts.append(f'(a{i} * {i} - IF {i} > 3 THEN {i}.5 ELSE f({i}, "s{i}"))')
+    return 'VAR r = ' + ' + '.join(parts)
+
+def count_nodes(root):
+    count, pending = 0, [root]
+    while pending:
+        node = pending.pop()
+        if node is None: continue
+        count += 1
+        if isinstance(node, BinOpNode):       pending += [node.left_node, node.right_node]
+        elif isinstance(node, UnaryOpNode):   pending.append(node.node)
+        elif isinstance(node, VarAssignNode): pending.append(node.value_node)
+        elif isinstance(node, IfNode):
+            for condition, expr in node.cases: pending += [condition, expr]
+            pending.append(node.else_case)
+        elif isinstance(node, ForNode):
+            pending += [node.start_value_node, node.end_value_node, node.step_value_node, node.body_node]
+        elif isinstance(node, WhileNode):     pending += [node.condition_node, node.body_node]
+        elif isinstance(node, FuncDefNode):   pending.append(node.node_to_call)
+        elif isinstance(node, CallNode):      pending += [node.node_to_call] + node.arg_nodes
+    return count
+
+def measure(terms):
+    text = generate_source(terms)
+    tracemalloc.start()
+
+    before = tracemalloc.get_traced_memory()[0]
+    tokens, error = Lexer('<bench>', text).make_tokens()
+    if error: raise Exception(error.as_string())
+    token_bytes = tracemalloc.get_traced_memory()[0] - before
+
+    before = tracemalloc.get_traced_memory()[0]
+    ast = Parser(tokens).parse()
+    if ast.error: raise Exception(ast.error.as_string())
+    node_bytes = tracemalloc.get_traced_memory()[0] - before
+
+    tracemalloc.stop()
+    nodes = count_nodes(ast.node)
+    return len(tokens), token_bytes, nodes, node_bytes
+
+
+if __name__ == '__main__':
+    terms = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    tokens, token_bytes, nodes, node_bytes = measure(terms)
+    print(f'source terms: {terms}')
+    print(f'tokens: {tokens:>9}  {token_bytes / tokens:8.1f} bytes/token')
+    print(f'nodes:  {nodes:>9}  {node_bytes / nodes:8.1f} bytes/node')
@@ -0,0 +1,239 @@
+from constants     import *
+from classes.node  import *
+from classes.interpreter import Number, String, FAST_NUMBER_OPS
+from classes.compiler import BIN_OPS
+
+
+### OPCODES ###
+# Every instruction is two slots in the code list: opcode, argument.
+# Instructions without an argument still take the slot (always 0)
+
+LOAD_CONST        = 0   # push consts[arg]
+LOAD_NAME         = 1   # push value of names[arg]
+STORE_NAME        = 2   # names[arg] = top of stack (value is kept on the stack)
+BINARY_OP         = 3   # pop right, left. push BINARY_FUNCS[arg](left, right)
+UNARY_NEG         = 4
+UNARY_NOT         = 5
+UNARY_POS         = 6
+POP_TOP           = 7
+LOAD_NONE         = 8
+JUMP              = 9   # pc = arg
+POP_JUMP_IF_FALSE = 10  # pop condition, pc = arg if it is not true
+FOR_PREP          = 11  # pop step, end, start. push range iterator
+FOR_ITER          = 12  # push Number.of(next(iterator)) or pop the iterator and jump to arg
+MAKE_FUNCTION     = 13  # push function built from consts[arg]
+CALL              = 14  # pop arg args and the callee, push returned value
+RETURN            = 15
+TAIL_CALL         = 16  # CALL for a call in tail position, a VMFunction replaces the running code
+LOOP              = 17  # pc = arg, the back edge of a loop (counted by the VM, see VM.steps)
+
+OPNAMES = [
+    'LOAD_CONST', 'LOAD_NAME', 'STORE_NAME', 'BINARY_OP', 'UNARY_NEG', 'UNARY_NOT',
+    'UNARY_POS', 'POP_TOP', 'LOAD_NONE', 'JUMP', 'POP_JUMP_IF_FALSE', 'FOR_PREP',
+    'FOR_ITER', 'MAKE_FUNCTION', 'CALL', 'RETURN', 'TAIL_CALL', 'LOOP',
+]
+
+# BINARY_OP's argument indexes the operator functions shared with the closure compiler
+BINARY_FUNCS = list(BIN_OPS.values())
+BINARY_FAST  = [FAST_NUMBER_OPS.get(op) for op in BIN_OPS] # None when there's no fast path
+BINARY_OPS   = {op: idx for idx, op in enumerate(BIN_OPS)}
+
+
+class CodeObject:
+    def __init__(self, name):
+        self.name   = name
+        self.code   = []
+        self.consts = []
+        self.names  = []
+        # positions[pc // 2] is the node that emitted the instruction, used to place errors
+        self.positions = []
+
+    def disassemble(self):
+        lines = []
+        for pc in range(0, len(self.code), 2):
+            op, arg = self.code[pc], self.code[pc + 1]
+            if op in (LOAD_NAME, STORE_NAME):   detail = self.names[arg]
+            elif op in (LOAD_CONST, MAKE_FUNCTION): detail = repr(self.consts[arg])
+            elif op == BINARY_OP:               detail = BINARY_FUNCS[arg].__name__
+            else:                               detail = arg
+            lines.append(f'{pc:>5} {OPNAMES[op]:<18} {detail}')
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return f'<code {self.name}>'
+
+
+class FunctionTemplate:
+    '''Constant used by MAKE_FUNCTION to build a function value at runtime'''
+    def __init__(self, name, arg_names, code, body_node, calls):
+        self.name      = name
+        self.arg_names = arg_names
+        self.code      = code
+        self.body_node = body_node
+        self.calls     = calls # FuncDefNode.calls, for memoization
+
+    def __repr__(self):
+        return f'<function template {self.name or "<anonymous>"}>'
+
+
+### BYTECODE COMPILER ###
+
+class BytecodeCompiler:
+    def __init__(self, name='<program>'):
+        self.code_obj = CodeObject(name)
+
+    def compile_program(self, node):
+        self.compile(node)
+        self.emit(RETURN)
+        return self.code_obj
+
+    def compile(self, node):
+        method_name = f'compile_{type(node).__name__}'
+        method = getattr(self, method_name, self.no_compile_method)
+        method(node)
+
+    def no_compile_method(self, node):
+        exception_msg = f'No compile_{type(node).__name__} method defined'
+        raise Exception(exception_msg)
+
+    # Helpers
+    def emit(self, op, arg=0, node=None):
+        code_obj = self.code_obj
+        code_obj.code.append(op)
+        code_obj.code.append(arg)
+        code_obj.positions.append(node)
+        return len(code_obj.code) - 2
+
+    def patch(self, pc, target):
+        self.code_obj.code[pc + 1] = target
+
+    def here(self):
+        return len(self.code_obj.code)
+
+    def add_const(self, value):
+        self.code_obj.consts.append(value)
+        return len(self.code_obj.consts) - 1
+
+    def add_name(self, name):
+        names = self.code_obj.names
+        if name not in names: names.append(name)
+        return names.index(name)
+
+    # Nodes
+    def compile_NumberNode(self, node):
+        const = Number.of(node.tok.value)
+        self.emit(LOAD_CONST, self.add_const(const), node)
+
+    def compile_StringNode(self, node):
+        const = String(node.tok.value)
+        self.emit(LOAD_CONST, self.add_const(const), node)
+
+    def compile_VarAccessNode(self, node):
+        self.emit(LOAD_NAME, self.add_name(node.var_name_tok.value), node)
+
+    def compile_VarAssignNode(self, node):
+        self.compile(node.value_node)
+        self.emit(STORE_NAME, self.add_name(node.var_name_tok.value), node)
+
+    def compile_BinOpNode(self, node):
+        self.compile_operators(node)
+
+    def compile_UnaryOpNode(self, node):
+        self.compile_operators(node)
+
+    def compile_operators(self, node):
+        '''
+        Emits a tree of BinOpNodes and UnaryOpNodes in post-order with an
+        explicit stack, deep expressions don't recurse in python
+        '''
+        pending = [(node, False)] # (node, operands already emitted)
+        while pending:
+            node, ready = pending.pop()
+            node_type = type(node)
+
+            if ready:
+                if node_type is BinOpNode: self.emit_binary(node)
+                else:                      self.emit_unary(node)
+            elif node_type is BinOpNode:
+                pending.append((node, True))
+                pending.append((node.right_node, False))
+                pending.append((node.left_node, False))
+            elif node_type is UnaryOpNode:
+                pending.append((node, True))
+                pending.append((node.node, False))
+            else:
+                self.compile(node)
+
+    def emit_binary(self, node):
+        op_tok = node.op_tok
+        op = BINARY_OPS.get(op_tok.type)
+        if op is None: op = BINARY_OPS[(op_tok.type, op_tok.value)]
+        self.emit(BINARY_OP, op, node)
+
+    def emit_unary(self, node):
+        if node.op_tok.type == TT_MINUS:
+            self.emit(UNARY_NEG, 0, node)
+        elif node.op_tok.matches(TT_KEYWORD, 'NOT'):
+            self.emit(UNARY_NOT, 0, node)
+        else:
+            self.emit(UNARY_POS, 0, node)
+
+    def compile_IfNode(self, node):
+        end_jumps = []
+        for condition, expr in node.cases:
+            self.compile(condition)
+            next_case = self.emit(POP_JUMP_IF_FALSE)
+            self.compile(expr)
+            end_jumps.append(self.emit(JUMP))
+            self.patch(next_case, self.here())
+
+        if node.else_case: self.compile(node.else_case)
+        else:              self.emit(LOAD_NONE)
+
+        for jump in end_jumps: self.patch(jump, self.here())
+
+    def compile_ForNode(self, node):
+        self.compile(node.start_value_node)
+        self.compile(node.end_value_node)
+        if node.step_value_node:
+            self.compile(node.step_value_node)
+        else:
+            self.emit(LOAD_CONST, self.add_const(Number.of(1)))
+        self.emit(FOR_PREP, 0, node)
+
+        loop_start = self.here()
+        for_iter = self.emit(FOR_ITER, 0, node)
+        self.emit(STORE_NAME, self.add_name(node.var_name_tok.value), node)
+        self.emit(POP_TOP)
+        self.compile(node.body_node)
+        self.emit(POP_TOP)
+        self.emit(LOOP, loop_start, node)
+        self.patch(for_iter, self.here())
+        self.emit(LOAD_NONE)
+
+    def compile_WhileNode(self, node):
+        loop_start = self.here()
+        self.compile(node.condition_node)
+        exit_jump = self.emit(POP_JUMP_IF_FALSE)
+        self.compile(node.body_node)
+        self.emit(POP_TOP)
+        self.emit(LOOP, loop_start, node)
+        self.patch(exit_jump, self.here())
+        self.emit(LOAD_NONE)
+
+    def compile_FuncDefNode(self, node):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg_name.value for arg_name in node.arg_name_toks]
+
+        body_compiler = BytecodeCompiler(func_name or '<anonymous>')
+        code = body_compiler.compile_program(node.node_to_call)
+        template = FunctionTemplate(func_name, arg_names, code, node.node_to_call, node.calls)
+        self.emit(MAKE_FUNCTION, self.add_const(template), node)
+        if func_name:
+            self.emit(STORE_NAME, self.add_name(func_name), node)
+
+    def compile_CallNode(self, node):
+        self.compile(node.node_to_call)
+        for arg_node in node.arg_nodes:
+            self.compile(arg_node)
+        self.emit(TAIL_CALL if node.tail else CALL, len(node.arg_nodes), node)
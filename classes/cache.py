@@ -0,0 +1,89 @@
+from collections import OrderedDict
+import threading
+
+
+### LRU CACHE ###
+
+class LRUCache:
+    '''Bounded LRU cache with hit/miss statistics. A capacity of 0 turns it off'''
+    def __init__(self, capacity):
+        self.capacity  = capacity
+        self.entries   = OrderedDict()
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        if self.capacity <= 0: return
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        self.evict()
+
+    def set_capacity(self, capacity):
+        self.capacity = capacity
+        self.evict()
+
+    def evict(self):
+        while len(self.entries) > max(self.capacity, 0):
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        return {
+            'size':      len(self.entries),
+            'capacity':  self.capacity,
+            'hits':      self.hits,
+            'misses':    self.misses,
+            'evictions': self.evictions,
+        }
+
+    def __len__(self):
+        return len(self.entries)
+
+
+### PROGRAM CACHE ###
+
+class CachedProgram:
+    __slots__ = ('tokens', 'ast', 'folded')
+
+    def __init__(self, tokens, ast, folded):
+        self.tokens = tokens
+        self.ast    = ast
+        self.folded = folded # Optimizer report, replayed on hits
+
+
+class ProgramCache(LRUCache):
+    '''
+    Lexed and parsed programs, keyed on
+    (filename, source text, optimization level).
+    Shared by the runs of every thread, so it takes a lock
+    '''
+    def __init__(self, capacity=256):
+        super().__init__(capacity)
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock: return super().get(key)
+
+    def put(self, key, entry):
+        with self.lock: super().put(key, entry)
+
+    def set_capacity(self, capacity):
+        with self.lock: super().set_capacity(capacity)
+
+    def clear(self):
+        with self.lock: super().clear()
@@ -0,0 +1,460 @@
+from utils import Context, Frame
+from constants     import *
+from classes.error import *
+from classes.node  import *
+from classes.interpreter import Number, String, Function, TailCall, FAST_NUMBER_OPS, pure_memo, call_memo_key
+from classes.vectorize import scalar_start
+from classes.meter import context_meter
+
+
+### CLOSURE COMPILER ###
+# Walks the AST once and turns every node into a python closure that takes
+# the current context. Running the program is just calling closures, there's
+# no method name building or getattr lookup per evaluated node.
+# Errors are raised as ErrorSignal, like in the Interpreter.
+# The AST must have gone through the Resolver first: function locals live in
+# list backed Frames and everything else in the global symbol table.
+
+def op_plus(left, right):  return left.added_to(right)
+def op_minus(left, right): return left.subtracted_by(right)
+def op_mul(left, right):   return left.multiplied_by(right)
+def op_div(left, right):   return left.divided_by(right)
+def op_pow(left, right):   return left.powed_by(right)
+def op_ee(left, right):    return left.get_comp_eq(right)
+def op_ne(left, right):    return left.get_comp_ne(right)
+def op_lt(left, right):    return left.get_comp_lt(right)
+def op_lte(left, right):   return left.get_comp_lte(right)
+def op_gt(left, right):    return left.get_comp_gt(right)
+def op_gte(left, right):   return left.get_comp_gte(right)
+def op_and(left, right):   return left.anded_by(right)
+def op_or(left, right):    return left.ored_by(right)
+
+BIN_OPS = {
+    TT_PLUS:  op_plus,
+    TT_MINUS: op_minus,
+    TT_MUL:   op_mul,
+    TT_DIV:   op_div,
+    TT_POW:   op_pow,
+    TT_EE:    op_ee,
+    TT_NE:    op_ne,
+    TT_LT:    op_lt,
+    TT_LTE:   op_lte,
+    TT_GT:    op_gt,
+    TT_GTE:   op_gte,
+    (TT_KEYWORD, 'AND'): op_and,
+    (TT_KEYWORD, 'OR'):  op_or,
+}
+
+def op_neg(operand): return operand.multiplied_by(Number.minus_one)
+def op_not(operand): return operand.notted()
+def op_pos(operand): return operand, None
+
+# Unary operators by token type, + is the only other one
+UNARY_OPS = {
+    TT_MINUS:   op_neg,
+    TT_KEYWORD: op_not,
+}
+
+
+# Operator trees nesting closures deeper than this are run by one closure
+# over a postfix list instead (see Compiler.compile_operators)
+MAX_OPERATOR_NESTING = 100
+
+# Postfix instructions of compile_operators
+OPERAND, BINARY, UNARY = 0, 1, 2
+
+
+def outer_load(context, var_name):
+    '''
+    A name that isn't set in the current frame: from the functions that tail
+    called into it, then the callers' frames, then the globals. The chain of
+    symbol tables on the tree engine is searched in the same order
+    '''
+    symbol_table = context.symbol_table
+    while context is not None:
+        frame = context.frame
+        if frame is not None:
+            slot = frame.names.get(var_name)
+            if slot is not None and frame.slots[slot] is not None: return frame.slots[slot]
+            if frame.rest:
+                value = frame.rest.get(var_name)
+                if value is not None: return value
+        context = context.parent
+    return symbol_table.get(var_name)
+
+def make_load(slot, var_name):
+    if slot is None:
+        def load(context): return outer_load(context, var_name)
+    else:
+        def load(context):
+            value = context.frame.slots[slot]
+            return outer_load(context, var_name) if value is None else value
+    return load
+
+def make_store(slot, var_name):
+    if slot is None:
+        def store(context, value): context.symbol_table.set(var_name, value)
+    else:
+        def store(context, value): context.frame.slots[slot] = value
+    return store
+
+
+class CompiledFunction(Function):
+    __slots__ = ('body', 'frame_names')
+
+    def __init__(self, name, body_node, arg_names, body, frame_names, memo=None, calls=None):
+        super().__init__(name, body_node, arg_names, memo, calls)
+        self.body = body
+        self.frame_names = frame_names
+
+    def generate_new_context(self, context, node):
+        # Locals live in the frame, the symbol table is only used for globals
+        new_context = Context(self.name, context, node)
+        new_context.symbol_table = context.symbol_table
+        new_context.frame = Frame(self.frame_names)
+        return new_context
+
+    def populate_args(self, arg_names, args, exec_context):
+        '''Arguments take the first slots of the frame'''
+        slots = exec_context.frame.slots
+        for idx, arg_value in enumerate(args):
+            slots[idx] = arg_value
+
+    def execute(self, args, context, node):
+        memo = self.memo
+        key = None
+        if memo is not None:
+            key = call_memo_key(self, args, lambda name: outer_load(context, name))
+            value = memo.get(key) if key is not None else None
+            if value is not None: return value
+
+        exec_context = self.generate_new_context(context, node)
+        self.check_and_populate_args(self.arg_names, args, exec_context, node)
+        value = self.body(exec_context)
+
+        # Tail calls run here, like in Function.execute
+        while type(value) is TailCall:
+            function = value.function
+            function.reenter(value.args, exec_context, value.node)
+            value = function.body(exec_context)
+
+        if key is not None and value is not None: memo.put(key, value)
+        return value
+
+    def __reduce__(self):
+        # Closures can't be pickled, other processes compile the body again
+        return (compiled_function, (subtree_nodes(self.body_node), self.name, self.body_node, self.arg_names, self.frame_names,
+                                    self.memo, self.calls))
+
+    def reenter(self, args, exec_context, node):
+        # The variables of the tail caller stay visible, like in the symbol
+        # table the tree engine reuses: its frame too when it is this function
+        frame = exec_context.frame
+        if frame.names is not self.frame_names:
+            rest = frame.rest if frame.rest is not None else {}
+            for name, slot in frame.names.items():
+                if frame.slots[slot] is not None: rest[name] = frame.slots[slot]
+            exec_context.frame = Frame(self.frame_names, rest)
+        super().reenter(args, exec_context, node)
+
+
+def compiled_function(nodes, name, body_node, arg_names, frame_names, memo, calls):
+    '''nodes are the body's, pickled first (see Function.__reduce__)'''
+    return CompiledFunction(name, body_node, arg_names, Compiler().compile(body_node), frame_names, memo, calls)
+
+
+class Compiler:
+    def compile(self, node):
+        method_name = f'compile_{type(node).__name__}'
+        method = getattr(self, method_name, self.no_compile_method)
+        return method(node)
+
+    def no_compile_method(self, node):
+        exception_msg = f'No compile_{type(node).__name__} method defined'
+        raise Exception(exception_msg)
+
+    def compile_NumberNode(self, node):
+        value = Number.of(node.tok.value)
+
+        def number(context):
+            return value
+        return number
+
+    def compile_StringNode(self, node):
+        value = String(node.tok.value)
+
+        def string(context):
+            return value
+        return string
+
+    def compile_VarAccessNode(self, node):
+        var_name = node.var_name_tok.value
+        load = make_load(node.address, var_name)
+        source, pos_start, pos_end = node.source, node.pos_start, node.pos_end
+
+        def var_access(context):
+            value = load(context)
+            if not value:
+                raise ErrorSignal(RuntimeError(
+                    source, pos_start, pos_end,
+                    f"'{var_name}' is not defined",
+                    context
+                ))
+            return value
+        return var_access
+
+    def compile_VarAssignNode(self, node):
+        store = make_store(node.address, node.var_name_tok.value)
+        value_node = self.compile(node.value_node)
+
+        def var_assign(context):
+            value = value_node(context)
+            store(context, value)
+            return value
+        return var_assign
+
+    def compile_BinOpNode(self, node):
+        if self.nests_too_deep(node): return self.compile_operators(node)
+
+        # A left associative chain (a + b - c ...) is compiled into one closure
+        # that loops over its operators: long chains don't nest closures or
+        # recurse in python, when compiling or when running
+        chain = []
+        while type(node) is BinOpNode:
+            chain.append(node)
+            node = node.left_node
+        first = self.compile(node)
+
+        steps = []
+        for bin_node in reversed(chain):
+            op_tok = bin_node.op_tok
+            key = op_tok.type if op_tok.type in BIN_OPS else (op_tok.type, op_tok.value)
+            steps.append((self.compile(bin_node.right_node), BIN_OPS[key], FAST_NUMBER_OPS.get(key), bin_node))
+
+        if len(steps) == 1: return self.bin_op(first, *steps[0])
+
+        def bin_op_chain(context):
+            left = first(context)
+            for right_node, op, fast, node in steps:
+                right = right_node(context)
+                if fast and type(left) is Number and type(right) is Number:
+                    left = fast(left.value, right.value)
+                    continue
+                left, error = op(left, right)
+                if error: raise ErrorSignal(error.locate(node, context))
+            return left
+        return bin_op_chain
+
+    def bin_op(self, left_node, right_node, op, fast, node):
+        if fast:
+            def bin_op(context):
+                left, right = left_node(context), right_node(context)
+                if type(left) is Number and type(right) is Number:
+                    return fast(left.value, right.value)
+                result, error = op(left, right)
+                if error: raise ErrorSignal(error.locate(node, context))
+                return result
+        else:
+            def bin_op(context):
+                result, error = op(left_node(context), right_node(context))
+                if error: raise ErrorSignal(error.locate(node, context))
+                return result
+        return bin_op
+
+    def compile_UnaryOpNode(self, node):
+        if self.nests_too_deep(node): return self.compile_operators(node)
+
+        # Like operator chains, - - NOT x is one closure
+        chain = []
+        while type(node) is UnaryOpNode:
+            chain.append(node)
+            node = node.node
+        operand = self.compile(node)
+
+        if len(chain) == 1: return self.unary_op(operand, chain[0])
+
+        def unary_op_chain(context):
+            number = operand(context)
+            for node in reversed(chain):
+                number, error = UNARY_OPS.get(node.op_tok.type, op_pos)(number)
+                if error: raise ErrorSignal(error.locate(node.node, context))
+            return number
+        return unary_op_chain
+
+    def unary_op(self, operand, node):
+        minus_one = Number.minus_one
+
+        if node.op_tok.type == TT_MINUS:
+            def unary_op(context):
+                number, error = operand(context).multiplied_by(minus_one)
+                if error: raise ErrorSignal(error.locate(node.node, context))
+                return number
+        elif node.op_tok.matches(TT_KEYWORD, 'NOT'):
+            def unary_op(context):
+                number, error = operand(context).notted()
+                if error: raise ErrorSignal(error.locate(node.node, context))
+                return number
+        else:
+            unary_op = operand
+        return unary_op
+
+    def nests_too_deep(self, node):
+        '''
+        True when compiling the operators under node into closures (above)
+        would nest more than MAX_OPERATOR_NESTING of them: every right
+        operand and every operand that isn't part of the chain takes a level
+        '''
+        pending = [(node, 0)]
+        while pending:
+            node, depth = pending.pop()
+            if depth > MAX_OPERATOR_NESTING: return True
+            if type(node) is BinOpNode:
+                left = node.left_node
+                pending.append((left, depth if type(left) is BinOpNode else depth + 1))
+                pending.append((node.right_node, depth + 1))
+            elif type(node) is UnaryOpNode:
+                operand = node.node
+                pending.append((operand, depth if type(operand) is UnaryOpNode else depth + 1))
+        return False
+
+    def compile_operators(self, node):
+        '''
+        Compiles a tree of BinOpNodes and UnaryOpNodes into a postfix list of
+        operands and operators, run by a single closure with a value stack.
+        Neither compiling nor running recurses in python, however deep the
+        nesting (1 + (1 + (1 + ...)), a ^ b ^ c ...)
+        '''
+        program = []
+        pending = [(node, False)] # (node, operands already emitted)
+        while pending:
+            node, ready = pending.pop()
+            node_type = type(node)
+
+            if ready:
+                op_tok = node.op_tok
+                if node_type is BinOpNode:
+                    key = op_tok.type if op_tok.type in BIN_OPS else (op_tok.type, op_tok.value)
+                    program.append((BINARY, BIN_OPS[key], FAST_NUMBER_OPS.get(key), node))
+                else:
+                    program.append((UNARY, UNARY_OPS.get(op_tok.type, op_pos), None, node))
+            elif node_type is BinOpNode:
+                pending.append((node, True))
+                pending.append((node.right_node, False))
+                pending.append((node.left_node, False))
+            elif node_type is UnaryOpNode:
+                pending.append((node, True))
+                pending.append((node.node, False))
+            else:
+                program.append((OPERAND, self.compile(node), None, node))
+
+        def operators(context):
+            values = []
+            for kind, op, fast, node in program:
+                if kind == OPERAND:
+                    values.append(op(context))
+                elif kind == BINARY:
+                    right = values.pop()
+                    left  = values[-1]
+                    if fast and type(left) is Number and type(right) is Number:
+                        values[-1] = fast(left.value, right.value)
+                        continue
+                    result, error = op(left, right)
+                    if error: raise ErrorSignal(error.locate(node, context))
+                    values[-1] = result
+                else:
+                    result, error = op(values[-1])
+                    if error: raise ErrorSignal(error.locate(node.node, context))
+                    values[-1] = result
+            return values[0]
+        return operators
+
+    def compile_IfNode(self, node):
+        cases = [(self.compile(condition), self.compile(expr)) for condition, expr in node.cases]
+        else_case = self.compile(node.else_case) if node.else_case else None
+
+        def if_expr(context):
+            for condition, expr in cases:
+                if condition(context).is_true():
+                    return expr(context)
+            if else_case:
+                return else_case(context)
+            return None
+        return if_expr
+
+    def compile_ForNode(self, node):
+        store = make_store(node.address, node.var_name_tok.value)
+        start_value_node = self.compile(node.start_value_node)
+        end_value_node   = self.compile(node.end_value_node)
+        step_value_node  = self.compile(node.step_value_node) if node.step_value_node else None
+        body_node = self.compile(node.body_node)
+
+        def for_expr(context):
+            start_value = start_value_node(context)
+            end_value   = end_value_node(context)
+            step_value  = step_value_node(context) if step_value_node else Number.of(1)
+
+            indices = range(start_value.value, end_value.value, step_value.value)
+            load = lambda var_node: make_load(var_node.address, var_node.var_name_tok.value)(context)
+
+            meter = context_meter(context)
+            for i in indices[scalar_start(node, indices, load, meter):]:
+                store(context, Number.of(i))
+                body_node(context)
+                if meter is not None: meter.tick(node, context)
+            return None
+        return for_expr
+
+    def compile_WhileNode(self, node):
+        condition_node = self.compile(node.condition_node)
+        body_node = self.compile(node.body_node)
+
+        def while_expr(context):
+            meter = context_meter(context)
+            while condition_node(context).is_true():
+                body_node(context)
+                if meter is not None: meter.tick(node, context)
+            return None
+        return while_expr
+
+    def compile_FuncDefNode(self, node):
+        func_name = node.var_name_tok.value if node.var_name_tok else None
+        arg_names = [arg_name.value for arg_name in node.arg_name_toks]
+        body_node = node.node_to_call
+        body = self.compile(body_node)
+        frame_names = node.frame_names
+        store = make_store(node.address, func_name) if func_name else None
+
+        def func_def(context):
+            func_value = CompiledFunction(func_name, body_node, arg_names, body, frame_names, pure_memo(node.calls, context), node.calls)
+            if store:
+                store(context, func_value)
+            return func_value
+        return func_def
+
+    def compile_CallNode(self, node):
+        node_to_call = self.compile(node.node_to_call)
+        arg_nodes = [self.compile(arg_node) for arg_node in node.arg_nodes]
+
+        if node.tail:
+            def call(context):
+                value_to_call = node_to_call(context)
+                args = [arg_node(context) for arg_node in arg_nodes]
+
+                options = context.options
+                if options and options.meter is not None: options.meter.tick(node, context)
+
+                if type(value_to_call) is CompiledFunction:
+                    return TailCall(value_to_call, args, node)
+                return value_to_call.execute(args, context, node)
+            return call
+
+        def call(context):
+            value_to_call = node_to_call(context)
+            args = [arg_node(context) for arg_node in arg_nodes]
+
+            options = context.options
+            if options and options.meter is not None: options.meter.tick(node, context)
+
+            return value_to_call.execute(args, context, node)
+        return call
+
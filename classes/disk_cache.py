@@ -0,0 +1,112 @@
+import os
+import sys
+import pickle
+import hashlib
+import tempfile
+
+
+### DISK CACHE ###
+# Stores parsed (and optimized) programs on disk, like CPython's __pycache__,
+# so short lived processes can skip the lexer and parser on a cold start.
+#
+# Entries are named after a hash of the tag, filename, optimization level and
+# source text. The tag changes with the cache format and python version, so
+# entries written by another version are never read. Unreadable, truncated or
+# stale entries are deleted and treated as misses. When the directory grows
+# past max_bytes the least recently used entries are removed.
+#
+# Entries are pickles: only point the cache at a directory you trust.
+
+CACHE_FORMAT = 5
+CACHE_TAG    = f'my-own-{CACHE_FORMAT}-py{sys.version_info[0]}{sys.version_info[1]}'
+SUFFIX       = '.ast'
+
+
+class DiskCache:
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits      = 0
+        self.misses    = 0
+        self.evictions = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def path_for(self, fn, text, optimize):
+        digest = hashlib.sha256()
+        for part in (CACHE_TAG, fn, str(optimize), text):
+            digest.update(part.encode('utf-8', 'surrogatepass'))
+            digest.update(b'\0')
+        return os.path.join(self.directory, digest.hexdigest() + SUFFIX)
+
+    def load(self, fn, text, optimize):
+        '''The cached program, or None'''
+        path = self.path_for(fn, text, optimize)
+        try:
+            with open(path, 'rb') as file:
+                tag, program = pickle.load(file)
+            if tag != CACHE_TAG: raise ValueError('stale cache entry')
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except Exception:
+            # Corrupt, truncated or written by something else: drop it
+            self.remove(path)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        try: os.utime(path) # Keeps the entry recently used for eviction
+        except OSError: pass
+        return program
+
+    def store(self, fn, text, optimize, program):
+        path = self.path_for(fn, text, optimize)
+        try:
+            data = pickle.dumps((CACHE_TAG, program), protocol=pickle.HIGHEST_PROTOCOL)
+        except (RecursionError, pickle.PicklingError):
+            return # Too deep to pickle, not worth failing the run over
+
+        # Write to a temporary file and rename, readers never see half an entry
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as file:
+                file.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            if tmp_path: self.remove(tmp_path)
+            return
+        self.evict()
+
+    def evict(self):
+        entries, total = [], 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(SUFFIX): continue
+            try: stat = entry.stat()
+            except OSError: continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total += stat.st_size
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes: break
+            self.remove(path)
+            total -= size
+            self.evictions += 1
+
+    def remove(self, path):
+        try: os.remove(path)
+        except OSError: pass
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(SUFFIX): self.remove(entry.path)
+
+    def stats(self):
+        return {
+            'directory': self.directory,
+            'max_bytes': self.max_bytes,
+            'hits':      self.hits,
+            'misses':    self.misses,
+            'evictions': self.evictions,
+        }
@@ -1,55 +1,100 @@
 ### ERRORS ###
 from utils import string_with_arrows
+from classes.node import BinOpNode
 
 class Error:
-    def __init__(self, pos_start, pos_end, error_name, details):
+    '''pos_start and pos_end are offsets into source (see classes/lexer.py)'''
+    def __init__(self, source, pos_start, pos_end, error_name, details):
+        self.source     = source
         self.pos_start  = pos_start
         self.pos_end    = pos_end
         self.error_name = error_name
         self.details    = details
 
     def as_string(self):
+        ln, _ = self.source.line_col(self.pos_start)
         result  = f'{self.error_name}: {self.details}\n'
-        result += f'File {self.pos_start.fn}, line {self.pos_start.ln + 1}'
-        result += f'\n\n {string_with_arrows(self.pos_start.ftxt, self.pos_start, self.pos_end)}'
+        result += f'File {self.source.fn}, line {ln + 1}'
+        result += f'\n\n {string_with_arrows(self.source, self.pos_start, self.pos_end)}'
         return result
 
 class IllegalCharError(Error):
-    def __init__(self, pos_start, pos_end, details):
-        super().__init__(pos_start, pos_end, 'Illegal Character', details)
+    def __init__(self, source, pos_start, pos_end, details):
+        super().__init__(source, pos_start, pos_end, 'Illegal Character', details)
 
 class InvalidSyntaxError(Error):
-    def __init__(self, pos_start, pos_end, details):
-        super().__init__(pos_start, pos_end, 'Invalid Syntax', details)
+    def __init__(self, source, pos_start, pos_end, details):
+        super().__init__(source, pos_start, pos_end, 'Invalid Syntax', details)
 
 class ExpectedCharError(Error):
-    def __init__(self, pos_start, pos_end, details):
-        super().__init__(pos_start, pos_end, 'Expected Character', details)
+    def __init__(self, source, pos_start, pos_end, details):
+        super().__init__(source, pos_start, pos_end, 'Expected Character', details)
 
 class RuntimeError(Error):
-    def __init__(self, pos_start, pos_end, details, context):
-        super().__init__(pos_start, pos_end, 'Runtime Error', details)
+    def __init__(self, source, pos_start, pos_end, details, context, on_right_operand=False, on_left_operand=False):
+        super().__init__(source, pos_start, pos_end, 'Runtime Error', details)
         self.context = context
+        self.on_right_operand = on_right_operand
+        self.on_left_operand  = on_left_operand
+
+    def locate(self, node, context):
+        '''
+        Values don't carry positions or contexts, so errors they return are
+        placed on the node being evaluated, or one of its operands: the right
+        one for errors like division by zero, the left one for illegal
+        operations. Unary operators pass their operand already
+        '''
+        if self.pos_start is None:
+            if self.on_right_operand: node = node.right_node
+            elif self.on_left_operand and type(node) is BinOpNode: node = node.left_node
+            self.source, self.pos_start, self.pos_end = node.source, node.pos_start, node.pos_end
+        if self.context is None: self.context = context
+        return self
     
     def as_string(self):
         result  = self.generate_traceback()
         result += f'{self.error_name}: {self.details}\n'
-        result += f'\n\n {string_with_arrows(self.pos_start.ftxt, self.pos_start, self.pos_end)}'
+        result += f'\n\n {string_with_arrows(self.source, self.pos_start, self.pos_end)}'
         return result
 
     def generate_traceback(self):
         result = ''
-        pos = self.pos_start
+        source, pos = self.source, self.pos_start
         context = self.context
 
         while context:
-            result = f'File {pos.fn}, line {str(pos.ln + 1)}, in {context.display_name}\n {result}'
-            pos = context.parent_entry_pos
+            ln, _ = source.line_col(pos)
+            result = f'File {source.fn}, line {str(ln + 1)}, in {context.display_name}\n {result}'
+            # The functions a chain of tail calls replaced in this context
+            if context.tail_calls:
+                for display_name, tail_node in reversed(context.tail_calls):
+                    ln, _ = tail_node.source.line_col(tail_node.pos_start)
+                    result = f'File {tail_node.source.fn}, line {str(ln + 1)}, in {display_name}\n {result}'
+                hidden = context.tail_call_count - len(context.tail_calls)
+                if hidden: result = f'... {hidden} earlier tail calls\n {result}'
+            # The call that entered this context, placed in the caller's source
+            entry = context.parent_entry_node
+            if entry: source, pos = entry.source, entry.pos_start
             context = context.parent
         
         traceback_msg = f'Traceback (most recent call last):\n{result}'
         return traceback_msg
 
+class LimitExceededError(RuntimeError):
+    '''A run used up its fuel or went past its deadline (see classes/meter.py)'''
+    def __init__(self, source, pos_start, pos_end, details, context):
+        super().__init__(source, pos_start, pos_end, details, context)
+        self.error_name = 'Limit Exceeded'
+
+class ErrorSignal(Exception):
+    '''
+    Raised by the lexer, parser and engines to carry an Error up the stack.
+    my_own.run() catches it once and returns the error
+    '''
+    def __init__(self, error):
+        super().__init__(error.details)
+        self.error = error
+
 
 if __name__=='__main__':
     print("You shouldn't be running this file")
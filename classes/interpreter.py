@@ -2,7 +2,16 @@ from utils import Context, SymbolTable
 from constants     import *
 from classes.error import *
 from classes.node  import *
-from classes.runtime import RuntimeResult
+from classes.cache import LRUCache
+from classes.vectorize import scalar_start
+from classes.meter import context_meter
+from array import array
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+import operator
+import pickle
+import asyncio
+import os
 
 
 ### VALUE is HERE to avoid circular import with INTERPRETER
@@ -10,27 +19,16 @@ from classes.runtime import RuntimeResult
 ### VALUES ###
 
 class Value:
-    def __init__(self):
-        self.set_pos()
-        self.set_context()
-
-    def set_pos(self, pos_start=None, pos_end=None):
-        self.pos_start = pos_start
-        self.pos_end   = pos_end
-        return self
-
-    def set_context(self, context=None):
-        self.context = context
-        return self
+    '''
+    Values are immutable and don't know where they came from, so the same
+    instance can be shared between variables, calls and contexts.
+    Errors they return are placed by the caller with RuntimeError.locate()
+    '''
+    __slots__ = ()
 
     def illegal_operation(self, other=None):
-        if not other: other = self
-        return RuntimeError(
-            self.pos_start, 
-            self.pos_end,
-            'Illegal operation', 
-            self.context
-        )
+        # On the value the operation was called on, the left operand
+        return RuntimeError(None, None, None, 'Illegal operation', None, on_left_operand=True)
 
     def added_to(self, other):
         return None, self.illegal_operation(other)
@@ -74,100 +72,87 @@ class Value:
     def notted(self):
         return None, self.illegal_operation()
 
-    def copy(self):
-        raise Exception('No copy method defined')
-
     def is_true(self):
         return False
 
 class Number(Value):
+    __slots__ = ('value',)
+
     def __init__(self, value):
-        super().__init__()
         self.value = value
 
     def added_to(self, other):
         if isinstance(other, Number):
-            return Number(self.value + other.value).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return Number.of(self.value + other.value), None
+        else: return elementwise(self, other, operator.add)
     
     def subtracted_by(self, other):
         if isinstance(other, Number):
-            return Number(self.value - other.value).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return Number.of(self.value - other.value), None
+        else: return elementwise(self, other, operator.sub)
     
     def multiplied_by(self, other):
         if isinstance(other, Number):
-            return Number(self.value * other.value).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return Number.of(self.value * other.value), None
+        else: return elementwise(self, other, operator.mul)
     
     def divided_by(self, other):
         if isinstance(other, Number):
             if other.value == 0:
                 error_msg = 'Division by zero'
-                return None, RuntimeError(
-                                other.pos_start, 
-                                other.pos_end,
-                                error_msg, 
-                                self.context
-                            )
+                return None, RuntimeError(None, None, None, error_msg, None, on_right_operand=True)
 
-            return Number(self.value / other.value).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return Number(self.value / other.value), None
+        else: return elementwise(self, other, operator.truediv)
 
     def powed_by(self, other):
         if isinstance(other, Number):
-            return Number(self.value ** other.value).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return Number.of(self.value ** other.value), None
+        else: return elementwise(self, other, operator.pow)
 
     # Logical Operators
     def get_comp_eq(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value == other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return (Number.true if self.value == other.value else Number.false), None
+        else: return elementwise(self, other, operator.eq)
 
     def get_comp_ne(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value != other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return (Number.true if self.value != other.value else Number.false), None
+        else: return elementwise(self, other, operator.ne)
 
     def get_comp_lt(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value <  other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return (Number.true if self.value < other.value else Number.false), None
+        else: return elementwise(self, other, operator.lt)
 
     def get_comp_lte(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value <= other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return (Number.true if self.value <= other.value else Number.false), None
+        else: return elementwise(self, other, operator.le)
 
     def get_comp_gt(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value >  other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return (Number.true if self.value > other.value else Number.false), None
+        else: return elementwise(self, other, operator.gt)
 
     def get_comp_gte(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value >= other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return (Number.true if self.value >= other.value else Number.false), None
+        else: return elementwise(self, other, operator.ge)
 
     def anded_by(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value and other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return Number.of(int(self.value and other.value)), None
+        else: return elementwise(self, other, int_and)
 
     def ored_by(self, other):
         if isinstance(other, Number):
-            return Number(int(self.value or  other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
+            return Number.of(int(self.value or  other.value)), None
+        else: return elementwise(self, other, int_or)
         
     def notted(self):
-        return Number(1 if self.value == 0 else 0).set_context(self.context), None
-
-    def copy(self):
-        copy = Number(self.value)
-        copy.set_pos(self.pos_start, self.pos_end)
-        copy.set_context(self.context)
-        return copy
+        return (Number.true if self.value == 0 else Number.false), None
 
     def is_true(self):
         return self.value != 0
@@ -175,187 +160,573 @@ class Number(Value):
     def __repr__(self):
         return str(self.value)
 
+    @staticmethod
+    def of(value):
+        '''Like Number(value) but shares one instance for the common small ints'''
+        if type(value) is int and SMALL_INT_MIN <= value <= SMALL_INT_MAX:
+            return Number.small_ints[value - SMALL_INT_MIN]
+        return Number(value)
+
+SMALL_INT_MIN = -256
+SMALL_INT_MAX = 1024
+
+Number.small_ints = [Number(i) for i in range(SMALL_INT_MIN, SMALL_INT_MAX + 1)]
 Number.null  = Number(0)
 Number.false = Number(0)
 Number.true  = Number(1)
+Number.minus_one = Number.of(-1)
+
+
+### FAST NUMERIC PATH ###
+# When both operands are exactly Number the engines skip the (result, error)
+# protocol and call these with the raw python values. Division isn't here,
+# it has to go through divided_by() for the zero check.
+
+def fast_arith(op):
+    def fast(a, b): return Number.of(op(a, b))
+    return fast
+
+def fast_compare(op):
+    def fast(a, b): return Number.true if op(a, b) else Number.false
+    return fast
+
+FAST_NUMBER_OPS = {
+    TT_PLUS:  fast_arith(operator.add),
+    TT_MINUS: fast_arith(operator.sub),
+    TT_MUL:   fast_arith(operator.mul),
+    TT_POW:   fast_arith(operator.pow),
+    TT_EE:    fast_compare(operator.eq),
+    TT_NE:    fast_compare(operator.ne),
+    TT_LT:    fast_compare(operator.lt),
+    TT_LTE:   fast_compare(operator.le),
+    TT_GT:    fast_compare(operator.gt),
+    TT_GTE:   fast_compare(operator.ge),
+    (TT_KEYWORD, 'AND'): fast_arith(lambda a, b: int(a and b)),
+    (TT_KEYWORD, 'OR'):  fast_arith(lambda a, b: int(a or b)),
+}
 
 
 
 ### FUNCTIONS ###
 class BaseFunction(Value):
+    __slots__ = ('name',)
+
     def __init__(self, name):
-        super().__init__()
         self.name = name or '<anonymous>'
 
-    def generate_new_context(self):
-        new_context = Context(self.name, self.context, self.pos_start)
-        new_context.symbol_table = SymbolTable(new_context.parent.symbol_table)
+    def generate_new_context(self, context, node):
+        '''context is the caller's context and node the CallNode being evaluated'''
+        new_context = Context(self.name, context, node)
+        new_context.symbol_table = SymbolTable(context.symbol_table)
         return new_context
 
-    def check_args(self, arg_names, args):
-        res = RuntimeResult()
+    def check_args(self, arg_names, args, context, node):
         expected_args_size = len(arg_names)
 
         if len(args) != expected_args_size:
-            return res.failure(RuntimeError(
-                self.pos_start, self.pos_end,
+            raise ErrorSignal(RuntimeError(
+                node.source, node.pos_start, node.pos_end,
                 f"'{self.name}' expected {expected_args_size} args, but received {len(args)}",
-                self.context
+                context
                 ))
 
-        return res.success(None)
-
     def populate_args(self, arg_names, args, exec_context):
         '''Populate the symbol_table'''
         for idx, arg_value in enumerate(args):
             arg_name = arg_names[idx]
-            arg_value.set_context(exec_context)
             exec_context.symbol_table.set(arg_name, arg_value)
 
-    def check_and_populate_args(self, arg_names, args, exec_context):
-        res = RuntimeResult()
-        res.register(self.check_args(arg_names, args))
-        if res.error: return res
+    def check_and_populate_args(self, arg_names, args, exec_context, node):
+        self.check_args(arg_names, args, exec_context.parent, node)
         self.populate_args(arg_names, args, exec_context)
-        return res.success(None)
 
 
 class BuiltInFunction(BaseFunction):
+    __slots__ = ()
+
     def __init__(self, name):
         super().__init__(name)
 
-    def execute(self, args):
+    def execute(self, args, context, node):
         '''
         Create separate execute methods for 
         each builtInFunction. Ex: 
             If name function is print, we will call execute_print()
         '''
-        res = RuntimeResult()
-        exec_context = self.generate_new_context()
+        exec_context = self.generate_new_context(context, node)
         
         
         method_name = f'execute_{self.name}'
         method = getattr(self, method_name, self.no_visit_method)
 
-        res.register(self.check_and_populate_args(method.arg_names, args, exec_context))
-        if res.error: return res
-
-        return_value = res.register(method(exec_context))
-        if res.error: return res
-        return res.success(return_value)
+        self.check_and_populate_args(method.arg_names, args, exec_context, node)
+        return method(exec_context)
 
     def no_visit_method(self, node, context):
         raise Exception(f'No execute_{self.name} method defined')
 
-    def copy(self):
-        copy = BuiltInFunction(self.name)
-        copy.set_pos(self.pos_start, self.pos_end)
-        copy.set_context(self.context)
-        return copy
-
     def __repr__(self):
         return f'<built-in function {self.name}>'
 
+    def __reduce__(self):
+        # Pickled by name, other processes use their own instance
+        return (getattr, (BuiltInFunction, self.name))
+
     ## Creating the built-in functions
 
     def execute_print(self, exec_context):
         print(str(exec_context.symbol_table.get('value')))
-        return RuntimeResult().success(Number.null)
+        return Number.null
     execute_print.arg_names = ['value']
 
     def execute_print_ret(self, exec_context):
-        str_ = String(str(exec_context.symbol_table.get('value')))
-        return RuntimeResult().success(str_)
+        return String(str(exec_context.symbol_table.get('value')))
     execute_print_ret.arg_names = ['value']
     
     def execute_input(self, exec_context):
         text = input()
-        return RuntimeResult().success(String(text))
+        return String(text)
     execute_input.arg_names = []
 
     def execute_input_int(self, exec_context):
-        text = input()
         while True:
+            text = input()
             try:
                 number = int(text)
                 break
             except ValueError:
                     print(f"'{text}' must be an integer. Try again!")
-        return RuntimeResult().success(Number(number))
+        return Number.of(number)
+    execute_input_int.arg_names = []
+
+    # Awaitable input and input_int, the VM awaits them under run_async()
+    async def execute_async(self, args, context, node):
+        exec_context = self.generate_new_context(context, node)
+        method = getattr(self, f'execute_{self.name}_async')
+        self.check_and_populate_args(method.arg_names, args, exec_context, node)
+        return await method(exec_context)
+
+    async def execute_input_async(self, exec_context):
+        return String(await self.read_line(exec_context))
+    execute_input_async.arg_names = []
+
+    async def execute_input_int_async(self, exec_context):
+        while True:
+            text = await self.read_line(exec_context)
+            try:
+                return Number.of(int(text))
+            except ValueError:
+                print(f"'{text}' must be an integer. Try again!")
+    execute_input_int_async.arg_names = []
+
+    async def read_line(self, exec_context):
+        # The run's read_line coroutine function, stdin in a thread otherwise
+        options = exec_context.options
+        if options and options.read_line: return await options.read_line()
+        return await asyncio.to_thread(input)
+
+    # Arrays
+    def execute_array(self, exec_context):
+        length = self.int_arg(exec_context, 'length')
+        value  = self.arg(exec_context, 'value', Number)
+        if length < 0: raise self.arg_error(exec_context, 'length must not be negative')
+        try:
+            return Array(Array.packed([value.value]).values * length)
+        except OverflowError:
+            raise self.arg_error(exec_context, 'value does not fit in 64 bits')
+    execute_array.arg_names = ['length', 'value']
+
+    def execute_array_range(self, exec_context):
+        start = self.int_arg(exec_context, 'start')
+        end   = self.int_arg(exec_context, 'end')
+        try:
+            return Array(array('q', range(start, end)))
+        except OverflowError:
+            raise self.arg_error(exec_context, 'start and end must fit in 64 bits')
+    execute_array_range.arg_names = ['start', 'end']
+
+    def execute_len(self, exec_context):
+        value = self.arg(exec_context, 'value', (Array, String))
+        return Number.of(len(value.values if type(value) is Array else value.value))
+    execute_len.arg_names = ['value']
+
+    def execute_get(self, exec_context):
+        values = self.arg(exec_context, 'array', Array).values
+        index  = self.int_arg(exec_context, 'index')
+        if not 0 <= index < len(values): raise self.arg_error(exec_context, 'index out of range')
+        return Number.of(values[index])
+    execute_get.arg_names = ['array', 'index']
+
+    def execute_slice(self, exec_context):
+        values = self.arg(exec_context, 'array', Array).values
+        start  = self.int_arg(exec_context, 'start')
+        end    = self.int_arg(exec_context, 'end')
+        if not 0 <= start <= end <= len(values): raise self.arg_error(exec_context, 'slice out of range')
+        return Array(values[start:end])
+    execute_slice.arg_names = ['array', 'start', 'end']
+
+    def execute_parallel_map(self, exec_context):
+        function = self.arg(exec_context, 'function', BaseFunction)
+        values   = self.arg(exec_context, 'array', Array).values
+        node, context = exec_context.parent_entry_node, exec_context.parent
+
+        options = context.options
+        workers = (options and options.workers) or os.cpu_count() or 1
+        payload = parallel_payload(function, context, node)
+        if workers <= 1 or len(values) <= 1:
+            # What a worker would get, so both ways run the same programs
+            outcomes = [parallel_chunk(0, values, parallel_unpack(payload))]
+        else:
+            outcomes = parallel_outcomes(payload, values, workers)
+
+        results = []
+        for outcome in outcomes:
+            if type(outcome) is tuple:
+                index, details = outcome
+                raise self.arg_error(exec_context, f'element {index} failed\n{details}')
+            results.extend(outcome)
+        try:
+            return Array.packed(results)
+        except OverflowError:
+            raise self.arg_error(exec_context, 'result does not fit in 64 bits')
+    execute_parallel_map.arg_names = ['function', 'array']
+
+    # Argument checks of the builtins above, errors point at the call
+    def arg(self, exec_context, name, value_type):
+        value = exec_context.symbol_table.get(name)
+        if not isinstance(value, value_type):
+            raise self.arg_error(exec_context, f"wrong type for '{name}'")
+        return value
+
+    def int_arg(self, exec_context, name):
+        value = self.arg(exec_context, name, Number).value
+        if type(value) is not int: raise self.arg_error(exec_context, f"'{name}' must be an int")
+        return value
+
+    def arg_error(self, exec_context, details):
+        node = exec_context.parent_entry_node
+        return ErrorSignal(RuntimeError(
+            node.source, node.pos_start, node.pos_end,
+            f"'{self.name}': {details}",
+            exec_context.parent
+        ))
 
 
 BuiltInFunction.print     = BuiltInFunction("print")
 BuiltInFunction.print_ret = BuiltInFunction("print_ret")
 BuiltInFunction.input     = BuiltInFunction("input")
 BuiltInFunction.input_int = BuiltInFunction("input_int")
+BuiltInFunction.array       = BuiltInFunction("array")
+BuiltInFunction.array_range = BuiltInFunction("array_range")
+BuiltInFunction.len         = BuiltInFunction("len")
+BuiltInFunction.get         = BuiltInFunction("get")
+BuiltInFunction.slice       = BuiltInFunction("slice")
+BuiltInFunction.parallel_map = BuiltInFunction("parallel_map")
 
 
 class Function(BaseFunction):
-    def __init__(self, name, body_node, arg_names):
+    __slots__ = ('body_node', 'arg_names', 'memo', 'calls')
+
+    def __init__(self, name, body_node, arg_names, memo=None, calls=None):
         super().__init__(name)
         self.body_node = body_node
         self.arg_names = arg_names
+        self.memo  = memo  # LRUCache of results when the function is memoized (see pure_memo)
+        self.calls = calls # Names the body calls, with memo
+
+    def execute(self, args, context, node, interpreter=None):
+        '''interpreter runs the body, a new Interpreter by default (a ProfilingInterpreter passes itself)'''
+        memo = self.memo
+        key = None
+        if memo is not None:
+            key = call_memo_key(self, args, context.symbol_table.get)
+            value = memo.get(key) if key is not None else None
+            if value is not None: return value
+
+        interpreter = interpreter or Interpreter()
+        exec_context = self.generate_new_context(context, node)
+
+        self.check_and_populate_args(self.arg_names, args, exec_context, node)
+        value = interpreter.visit(self.body_node, exec_context)
+
+        # Calls in tail position come back as TailCall and run here, in the
+        # same context, so deep recursion doesn't nest python frames
+        while type(value) is TailCall:
+            function = value.function
+            function.reenter(value.args, exec_context, value.node)
+            value = interpreter.visit(function.body_node, exec_context)
+
+        if key is not None and value is not None: memo.put(key, value)
+        return value
+
+    def reenter(self, args, exec_context, node):
+        '''
+        Reuses the context of the function making a tail call to this one.
+        Its variables stay visible like they would be through the parent
+        symbol table, the caller can't run again anyway
+        '''
+        self.check_args(self.arg_names, args, exec_context, node)
+        exec_context.tail_call(self.name, node)
+        self.populate_args(self.arg_names, args, exec_context)
+
+    def __repr__(self):
+        return f'<function {self.name}>'
 
-    def execute(self, args):
-        res = RuntimeResult()
-        interpreter = Interpreter()
-        exec_context = self.generate_new_context()
+    def __reduce__(self):
+        # The body's nodes go first, children before parents, so pickle
+        # doesn't recurse through a deep body (see subtree_nodes)
+        state = {slot: getattr(self, slot) for cls in type(self).__mro__ for slot in getattr(cls, '__slots__', ())}
+        return (unpickled_function, (type(self), subtree_nodes(self.body_node), state))
 
-        res.register(self.check_and_populate_args(self.arg_names, args, exec_context))
-        if res.error: return res
 
-        value = res.register(interpreter.visit(self.body_node, exec_context))
-        if res.error: return res
-        return res.success(value)
+def unpickled_function(function_type, nodes, state):
+    function = object.__new__(function_type)
+    for slot, value in state.items(): setattr(function, slot, value)
+    return function
 
-    def copy(self):
-        copy = Function(self.name, self.body_node, self.arg_names)
-        copy.set_pos(self.pos_start, self.pos_end)
-        copy.set_context(self.context)
-        return copy
 
-    def __repr__(self):
-        return f'<function {self.name}>'
+class TailCall:
+    '''What a call in tail position gives back to the function running it'''
+    __slots__ = ('function', 'args', 'node')
+
+    def __init__(self, function, args, node):
+        self.function = function
+        self.args     = args
+        self.node     = node
 
 
 class String(Value):
+    __slots__ = ('value',)
+
     def __init__(self, value):
-        super().__init__()
         self.value = value
 
     def added_to(self, other):
         if isinstance(other, String):
-            return String(self.value + other.value).set_context(self.context), None
+            return String(self.value + other.value), None
         else:
-            return None, Value.illegal_operation(self, other)
+            return None, self.illegal_operation(other)
     
     def multiplied_by(self, other):
         if isinstance(other, Number):
-            return String(self.value * other.value).set_context(self.context), None
+            return String(self.value * other.value), None
         else:
-            return None, Value.illegal_operation(self, other)
+            return None, self.illegal_operation(other)
 
     def is_true(self):
         return len(self.value) > 0
 
     def get_comp_eq(self, other):
         if isinstance(other, String):
-            return Number(int(self.value == other.value)).set_context(self.context), None
-        else: return None, Value.illegal_operation(self.pos_start, other.pos_end)
-
-    def copy(self):
-        copy = String(self.value)
-        copy.set_pos(self.pos_start, self.pos_end)
-        copy.set_context(self.context)
-        return copy
-    
+            return (Number.true if self.value == other.value else Number.false), None
+        else: return None, self.illegal_operation(other)
+
     def __str__(self):
         return self.value
 
     def __repr__(self):
         return f'"{self.value}"'
 
+
+class Array(Value):
+    '''
+    Packed numbers in an array.array: 'q' (64 bit ints) or 'd' (floats).
+    Operators work element by element, between Arrays of the same length or
+    between an Array and a Number, without making a Number per element
+    '''
+    __slots__ = ('values',)
+
+    def __init__(self, values):
+        self.values = values
+
+    @staticmethod
+    def packed(results):
+        '''Ints stay ints unless a float is mixed in. Raises OverflowError past 64 bits'''
+        try:
+            return Array(array('q', results))
+        except TypeError:
+            return Array(array('d', results))
+
+    def added_to(self, other):      return elementwise(self, other, operator.add)
+    def subtracted_by(self, other): return elementwise(self, other, operator.sub)
+    def multiplied_by(self, other): return elementwise(self, other, operator.mul)
+    def divided_by(self, other):    return elementwise(self, other, operator.truediv)
+    def powed_by(self, other):      return elementwise(self, other, operator.pow)
+    def get_comp_eq(self, other):   return elementwise(self, other, operator.eq)
+    def get_comp_ne(self, other):   return elementwise(self, other, operator.ne)
+    def get_comp_lt(self, other):   return elementwise(self, other, operator.lt)
+    def get_comp_lte(self, other):  return elementwise(self, other, operator.le)
+    def get_comp_gt(self, other):   return elementwise(self, other, operator.gt)
+    def get_comp_gte(self, other):  return elementwise(self, other, operator.ge)
+    def anded_by(self, other):      return elementwise(self, other, int_and)
+    def ored_by(self, other):       return elementwise(self, other, int_or)
+
+    def notted(self):
+        return Array(array('q', map(operator.not_, self.values))), None
+
+    def is_true(self):
+        return len(self.values) > 0
+
+    def __repr__(self):
+        return f'[{", ".join(map(str, self.values))}]'
+
+def int_and(a, b): return int(a and b)
+def int_or(a, b):  return int(a or b)
+
+def elementwise(left, right, op):
+    '''
+    left op right when one of them is an Array, a Number operand is used
+    against every element. Errors are placed by the caller, like Number's
+    '''
+    if type(left) is Array and type(right) is Array:
+        if len(left.values) != len(right.values):
+            return None, RuntimeError(None, None, None, 'Arrays have different lengths', None, on_right_operand=True)
+        left_values, right_values = left.values, right.values
+    elif type(left) is Array and isinstance(right, Number):
+        left_values, right_values = left.values, repeat(right.value, len(left.values))
+    elif isinstance(left, Number) and type(right) is Array:
+        left_values, right_values = repeat(left.value, len(right.values)), right.values
+    else:
+        return None, left.illegal_operation(right)
+
+    if op is operator.truediv and (0 in right.values if type(right) is Array else right.value == 0):
+        return None, RuntimeError(None, None, None, 'Division by zero', None, on_right_operand=True)
+
+    try:
+        return Array.packed(list(map(op, left_values, right_values))), None
+    except ZeroDivisionError:
+        # 0 ^ -1
+        return None, RuntimeError(None, None, None, 'Division by zero', None, on_right_operand=True)
+    except (OverflowError, ValueError, TypeError):
+        # Ints past 64 bits, int() of inf or nan, complex powers
+        return None, RuntimeError(None, None, None, 'Array element out of range', None)
+
+### MEMOIZATION ###
+# Opt-in per run (RunOptions.memoize). A function defined while it is on gets a
+# result cache if its body is pure (see pure_calls). Scoping is dynamic, so the
+# functions it calls are only known for each call: they are resolved then,
+# with the functions those call and so on, and are part of the key. A call
+# goes without the cache if one of them isn't memoized itself, or if one of
+# their arguments has the name of a called function (it would resolve
+# differently inside). Calls in tail position run in the caller's context
+# and are never cached, their result is the caller's.
+
+def pure_memo(calls, context):
+    '''Result cache for a function being defined, or None. calls is its FuncDefNode's'''
+    options = context.options
+    if options is None or not options.memoize or calls is None: return None
+    return LRUCache(options.memoize)
+
+def call_memo_key(function, args, load):
+    '''
+    The key of a call to a memoized function, or None when the call can't
+    use the cache. load(name) gives what a name is bound to for the call
+    '''
+    callees = {}
+    arg_names = set(function.arg_names)
+    pending = [function]
+    while pending:
+        for name in pending.pop().calls:
+            if name in callees: continue
+            callee = load(name)
+            if not isinstance(callee, Function) or callee.memo is None: return None
+            callees[name] = callee
+            arg_names.update(callee.arg_names)
+            pending.append(callee)
+    if not arg_names.isdisjoint(callees): return None
+    return memo_key(args), tuple(callees.items())
+
+def memo_key(args):
+    '''Numbers and strings by value (and python type, 1 and 1.0 differ), the rest by identity'''
+    key = []
+    for arg in args:
+        if type(arg) is Number or type(arg) is String:
+            key.append((type(arg), type(arg.value), arg.value))
+        else:
+            key.append(arg)
+    return tuple(key)
+
+
+### PARALLEL MAP ###
+# parallel_map(function, array) runs the calls in a pool of processes. The
+# function, the call, the run options and the global symbol table are pickled
+# once and unpickled by each worker when it starts, the array is sent in
+# chunks. Functions run on the engine that made them but only see globals,
+# not the caller's locals. Without workers the calls run in process on an
+# unpickled copy all the same.
+
+CHUNKS_PER_WORKER = 4
+
+parallel_job = None # (function, context, node) in a worker
+
+def parallel_payload(function, context, node):
+    '''The pickled job: the function, the run's globals and options, the call'''
+    # The run's globals are the symbol table of its first context
+    root = context
+    while root.parent: root = root.parent
+    try:
+        # The call's nodes first, like a function's body (see Function.__reduce__)
+        return pickle.dumps((subtree_nodes(node), function, portable_symbols(root.symbol_table), context.options, node))
+    except (pickle.PicklingError, TypeError, AttributeError, RecursionError) as exception:
+        raise ErrorSignal(RuntimeError(
+            node.source, node.pos_start, node.pos_end,
+            f"'parallel_map': can't send the function to the workers ({exception})",
+            context
+        ))
+
+def parallel_outcomes(payload, values, workers):
+    '''Outcome of each chunk of values, in order (see parallel_chunk)'''
+    size = -(-len(values) // (workers * CHUNKS_PER_WORKER))
+    starts = range(0, len(values), size)
+    with ProcessPoolExecutor(min(workers, len(starts)), initializer=parallel_init, initargs=(payload,)) as pool:
+        return list(pool.map(parallel_chunk, starts, (values[start:start + size] for start in starts)))
+
+def portable_symbols(table):
+    '''
+    A copy of table without the values that can't be pickled, they stay in
+    this process. Its parent, the builtins, is sent as is
+    '''
+    symbols = SymbolTable(table.parent)
+    for name, value in table.symbols.items():
+        try:
+            pickle.dumps(value)
+        except (pickle.PicklingError, TypeError, AttributeError, RecursionError):
+            continue
+        symbols.set(name, value)
+    return symbols
+
+def parallel_unpack(payload):
+    _, function, symbols, options, node = pickle.loads(payload)
+    context = Context('<program>')
+    context.symbol_table = symbols
+    context.options = options
+    return function, context, node
+
+def parallel_init(payload):
+    global parallel_job
+    parallel_job = parallel_unpack(payload)
+
+def parallel_chunk(start, values, job=None):
+    '''The results of a chunk, or (index, error text) for the first element that failed'''
+    function, context, node = job or parallel_job
+    results = []
+    for index, value in enumerate(values, start):
+        try:
+            result = function.execute([Number.of(value)], context, node)
+        except ErrorSignal as signal:
+            return index, signal.error.as_string()
+        if not isinstance(result, Number):
+            return index, f'expected a number, got {result!r}'
+        results.append(result.value)
+    return results
+
+
 ### INTERPRETER ###
+# visit() returns the node's value. Runtime errors are raised as ErrorSignal
+# and caught once, by whoever started the run.
+
+# Evaluated by visit_operators() without recursing
+OPERATOR_NODES = (BinOpNode, UnaryOpNode)
 
 class Interpreter:
     def visit(self, node, context):
@@ -368,41 +739,79 @@ class Interpreter:
         raise Exception(exception_msg)
         
     def visit_NumberNode(self, node, context):
-        number = Number(node.tok.value).set_context(context)
-        number = number.set_pos(node.pos_start, node.pos_end)
-        return RuntimeResult().success(number)
+        return Number.of(node.tok.value)
 
     def visit_VarAccessNode(self, node, context):
-        res = RuntimeResult()
         var_name = node.var_name_tok.value
         value = context.symbol_table.get(var_name)
 
         if not value:
             error_msg = f"'{var_name}' is not defined"
-            return None, RuntimeError(
+            raise ErrorSignal(RuntimeError(
+                            node.source,
                             node.pos_start, 
                             node.pos_end,
                             error_msg, 
                             context
-                        )
-        value = value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
-        return res.success(value)
+                        ))
+        return value
 
     def visit_VarAssignNode(self, node, context):
-        res = RuntimeResult()
         var_name = node.var_name_tok.value
-        value = res.register(self.visit(node.value_node, context))
-        if res.error: return res
+        value = self.visit(node.value_node, context)
         
         context.symbol_table.set(var_name, value)
-        return res.success(value)
+        return value
 
     def visit_BinOpNode(self, node, context):
-        res = RuntimeResult()
-        left  = res.register(self.visit(node.left_node, context))
-        if res.error: return res
-        right = res.register(self.visit(node.right_node, context))
-        if res.error: return res
+        left_node, right_node = node.left_node, node.right_node
+        if type(left_node) in OPERATOR_NODES or type(right_node) in OPERATOR_NODES:
+            return self.visit_operators(node, context)
+
+        # Operands aren't operators themselves, no stack needed
+        left  = self.visit(left_node, context)
+        right = self.visit(right_node, context)
+        return self.binary_op(node, left, right, context)
+
+    def visit_UnaryOpNode(self, node, context):
+        return self.visit_operators(node, context)
+
+    def visit_operators(self, node, context):
+        '''
+        Evaluates a tree of BinOpNodes and UnaryOpNodes with an explicit
+        stack instead of recursing, so long chains and deep nesting are only
+        limited by memory. Any other node is an operand and visited as usual.
+        Operands are still evaluated left to right
+        '''
+        values  = []
+        pending = [(node, False)] # (node, operands already evaluated)
+
+        while pending:
+            node, ready = pending.pop()
+            node_type = type(node)
+
+            if ready:
+                if node_type is BinOpNode:
+                    right = values.pop()
+                    values[-1] = self.binary_op(node, values[-1], right, context)
+                else:
+                    values[-1] = self.unary_op(node, values[-1], context)
+            elif node_type is BinOpNode:
+                pending.append((node, True))
+                pending.append((node.right_node, False))
+                pending.append((node.left_node, False))
+            elif node_type is UnaryOpNode:
+                pending.append((node, True))
+                pending.append((node.node, False))
+            else:
+                values.append(self.visit(node, context))
+
+        return values[0]
+
+    def binary_op(self, node, left, right, context):
+        fast = FAST_NUMBER_OPS.get(node.op_tok.type)
+        if fast and type(left) is Number and type(right) is Number:
+            return fast(left.value, right.value)
 
         op     = node.op_tok.type
         if   op == TT_PLUS:
@@ -433,119 +842,90 @@ class Interpreter:
         elif node.op_tok.matches(TT_KEYWORD, 'OR'):
             result, error = left.ored_by(right)
 
-        if error: return res.failure(error)
-        else:
-            result = result.set_pos(node.pos_start, node.pos_end)
-            return res.success(result)
+        if error: raise ErrorSignal(error.locate(node, context))
+        return result
     
-    def visit_UnaryOpNode(self, node, context):
-        res = RuntimeResult()
-
-        number = res.register(self.visit(node.node, context))
-        if res.error: return res
-
+    def unary_op(self, node, number, context):
         error = None
 
         if node.op_tok.type == TT_MINUS:
-            number, error = number.multiplied_by(Number(-1))
+            number, error = number.multiplied_by(Number.minus_one)
         elif node.op_tok.matches(TT_KEYWORD, 'NOT'):
             number, error = number.notted()
 
-        if error: return res.failure(error)
-        else:
-            number = number.set_pos(node.pos_start, node.pos_end) 
-            return res.success(number)
+        if error: raise ErrorSignal(error.locate(node.node, context))
+        return number
 
     def visit_IfNode(self, node, context):
-        res = RuntimeResult()
-        
         for condition, expr in node.cases:
-            condition_value = res.register(self.visit(condition, context))
-            if res.error: return res
+            condition_value = self.visit(condition, context)
 
             if condition_value.is_true():
-                expr_value = res.register(self.visit(expr, context))
-                if res.error: return res
-                return res.success(expr_value)
+                return self.visit(expr, context)
 
         if node.else_case:
-            else_value = res.register(self.visit(node.else_case, context))
-            if res.error: return res
-            return res.success(else_value)
+            return self.visit(node.else_case, context)
 
-        return res.success(None)
+        return None
 
 
     def visit_ForNode(self, node, context):
-        res = RuntimeResult()
-
-        start_value = res.register(self.visit(node.start_value_node, context))
-        if res.error: return res
-
-        end_value = res.register(self.visit(node.end_value_node, context))
-        if res.error: return res
+        start_value = self.visit(node.start_value_node, context)
+        end_value = self.visit(node.end_value_node, context)
 
         if node.step_value_node:
-            step_value = res.register(self.visit(node.step_value_node, context))
-            if res.error: return res
-        else: step_value = Number(1)
+            step_value = self.visit(node.step_value_node, context)
+        else: step_value = Number.of(1)
 
-        for i in range(start_value.value, end_value.value, step_value.value):
+        indices = range(start_value.value, end_value.value, step_value.value)
+        load = lambda var_node: context.symbol_table.get(var_node.var_name_tok.value)
+
+        meter = context_meter(context)
+        for i in indices[scalar_start(node, indices, load, meter):]:
             # Adding the idx to the symbol table so It can be accessed inside the loop
-            context.symbol_table.set(node.var_name_tok.value, Number(i))
-            res.register(self.visit(node.body_node, context))
-            if res.error: return res
+            context.symbol_table.set(node.var_name_tok.value, Number.of(i))
+            self.visit(node.body_node, context)
+            if meter is not None: meter.tick(node, context)
 
-        return res.success(None)
+        return None
 
     def visit_WhileNode(self, node, context):
-        res = RuntimeResult()
-
-        condition = res.register(self.visit(node.condition_node, context))
-        if res.error: return res
+        condition = self.visit(node.condition_node, context)
+        meter = context_meter(context)
 
         while condition.is_true():
-            res.register(self.visit(node.body_node, context))
-            if res.error: return res
+            self.visit(node.body_node, context)
+            if meter is not None: meter.tick(node, context)
+            condition = self.visit(node.condition_node, context)
 
-            condition = res.register(self.visit(node.condition_node, context))
-            if res.error: return res
-
-        return res.success(None)
+        return None
 
     def visit_FuncDefNode(self, node, context):
-        res = RuntimeResult()
-
         func_name = node.var_name_tok.value if node.var_name_tok else None
         arg_names = [arg_name.value for arg_name in node.arg_name_toks]
         node_to_call = node.node_to_call
-        func_value = Function(func_name, node_to_call, arg_names).set_context(context).set_pos(node.pos_start, node.pos_end)
+        func_value = Function(func_name, node_to_call, arg_names, pure_memo(node.calls, context), node.calls)
 
         #If function has name, add it to the symbol_table
         if node.var_name_tok:
             context.symbol_table.set(func_name, func_value)
-        return res.success(func_value)
+        return func_value
 
 
     def visit_CallNode(self, node, context):
-        res = RuntimeResult()
         args = []
 
-        value_to_call = res.register(self.visit(node.node_to_call, context))
-        if res.error: return res
-        value_to_call = value_to_call.copy().set_pos(node.pos_start, node.pos_end)
+        value_to_call = self.visit(node.node_to_call, context)
 
         for arg_node in node.arg_nodes:
-            args.append(res.register(self.visit(arg_node, context)))
-            if res.error: return res
+            args.append(self.visit(arg_node, context))
 
-        return_value = res.register(value_to_call.execute(args))
-        if res.error: return res
-        return_value = return_value.copy().set_pos(node.pos_start, node.pos_end).set_context(context)
-        return res.success(return_value)
+        options = context.options
+        if options and options.meter is not None: options.meter.tick(node, context)
 
-    def visit_StringNode(self, node, context):
-        return RuntimeResult().success(
-            String(node.tok.value).set_context(context).set_pos(node.pos_start,node.pos_end)
-        )
+        if node.tail and type(value_to_call) is Function:
+            return TailCall(value_to_call, args, node)
+        return value_to_call.execute(args, context, node)
 
+    def visit_StringNode(self, node, context):
+        return String(node.tok.value)
@@ -1,45 +1,53 @@
+from bisect import bisect_right
+
 from constants import * 
 from classes.token import Token
 from classes.error import *
 
-class Position:
-    def __init__(self, idx, ln, col, fn, ftxt):
-        self.idx  = idx
-        self.ln   = ln
-        self.col  = col
+class Source:
+    '''
+    The text being lexed. Tokens and nodes only keep integer offsets into it
+    and a reference to it, lines and columns are worked out from a line
+    index built the first time an error needs them
+    '''
+    __slots__ = ('fn', 'text', 'line_starts')
+
+    def __init__(self, fn, text):
         self.fn   = fn
-        self.ftxt = ftxt
+        self.text = text
+        self.line_starts = None
 
-    def advance(self, current_char=None):
-        self.idx += 1
-        self.col += 1
-        
-        if current_char == '\n':
-            self.ln  =+ 1
-            self.col = 0
-        
-        return self
+    def line_col(self, idx):
+        '''(line, column) of an offset, both starting at 0'''
+        if self.line_starts is None:
+            line_starts, text = [0], self.text
+            newline = text.find('\n')
+            while newline >= 0:
+                line_starts.append(newline + 1)
+                newline = text.find('\n', newline + 1)
+            self.line_starts = line_starts
 
-    def copy(self):
-        return Position(self.idx, self.ln, self.col, self.fn, self.ftxt)
+        ln = bisect_right(self.line_starts, idx) - 1
+        return ln, idx - self.line_starts[ln]
 
 
 class Lexer:
     def __init__(self, fn, text):
-        self.fn   = fn
-        self.text = text
-        self.pos  = Position(-1, 0, -1, fn, text) 
+        self.fn     = fn
+        self.text   = text
+        self.source = Source(fn, text)
+        self.idx    = -1
         self.current_char = None
         self.advance()
 
     def advance(self):
-        self.pos.advance(self.current_char)
-        self.current_char = self.text[self.pos.idx] if self.pos.idx < len(self.text) else None
+        self.idx += 1
+        self.current_char = self.text[self.idx] if self.idx < len(self.text) else None
 
     def make_number(self):
         num_str = ''
         dot_count = 0 
-        pos_start = self.pos.copy()
+        pos_start = self.idx
 
         while (self.current_char != None and self.current_char in (DIGITS + '.')):
             if self.current_char == '.':
@@ -53,81 +61,81 @@ class Lexer:
             self.advance()
 
         if dot_count == 0:
-            return Token(TT_INT, int(num_str), pos_start, self.pos)
+            return Token(TT_INT, int(num_str), self.source, pos_start, self.idx)
         else: 
-            return Token(TT_FLOAT, float(num_str), pos_start, self.pos)
+            return Token(TT_FLOAT, float(num_str), self.source, pos_start, self.idx)
 
     def make_identifier(self):
         id_str = ''
-        pos_start = self.pos.copy()
+        pos_start = self.idx
 
         while self.current_char != None and self.current_char in LETTERS_DIGITS + '_':
             id_str += self.current_char
             self.advance()
 
         tok_type = TT_KEYWORD if id_str in KEYWORDS else TT_IDENTIFIER
-        return Token(tok_type, id_str, pos_start, self.pos)
+        return Token(tok_type, id_str, self.source, pos_start, self.idx)
 
 
     def make_minus_or_arrow(self):
         tok_type = TT_MINUS
-        pos_start = self.pos.copy()
+        pos_start = self.idx
 
         self.advance()
         if self.current_char == '>':
             tok_type = TT_ARROW
             self.advance()
 
-        return Token(tok_type, pos_start, self.pos)
+        return Token(tok_type, None, self.source, pos_start, self.idx)
     
     def make_not_equals(self):
-        pos_start = self.pos.copy()
+        pos_start = self.idx
         self.advance()
 
         if self.current_char == '=':
             self.advance()
-            return Token(TT_NE, pos_start=pos_start, pos_end=self.pos), None
+            return Token(TT_NE, None, self.source, pos_start, self.idx)
         
         self.advance()
-        return None, ExpectedCharError(pos_start, self.pos, "'=' (after '!')")
+        raise ErrorSignal(ExpectedCharError(self.source, pos_start, self.idx, "'=' (after '!')"))
 
     def make_equals(self):
         tok_type = TT_EQ
-        pos_start = self.pos.copy()
+        pos_start = self.idx
         self.advance()
 
         if self.current_char == '=':
             self.advance()
             tok_type = TT_EE
         
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
+        return Token(tok_type, None, self.source, pos_start, self.idx)
 
     def make_less_than(self):
         tok_type = TT_LT
-        pos_start = self.pos.copy()
+        pos_start = self.idx
         self.advance()
 
         if self.current_char == '=':
             self.advance()
             tok_type = TT_LTE
         
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
+        return Token(tok_type, None, self.source, pos_start, self.idx)
 
     def make_greater_than(self):
         tok_type = TT_GT
-        pos_start = self.pos.copy()
+        pos_start = self.idx
         self.advance()
 
         if self.current_char == '=':
             self.advance()
             tok_type = TT_GTE
         
-        return Token(tok_type, pos_start=pos_start, pos_end=self.pos)
+        return Token(tok_type, None, self.source, pos_start, self.idx)
 
     def make_string(self):
         quote_type = self.current_char # Saving ' or "
         str_ = ''
-        pos_start = self.pos.copy()
+        pos_start = self.idx
         is_escape_char = False
         escape_chars = {
             'n': '\n',
@@ -149,84 +157,84 @@ class Lexer:
             self.advance()
 
         self.advance()
-        return Token(TT_STRING, str_, pos_start, self.pos)
+        return Token(TT_STRING, str_, self.source, pos_start, self.idx)
 
     def make_tokens(self):
-        tokens = []
-
+        try:
+            return self.tokenize(), None
+        except ErrorSignal as signal:
+            return [], signal.error
+
+    def tokenize(self):
+        '''Returns the list of tokens, errors are raised as ErrorSignal'''
+        return list(self.stream())
+
+    def stream(self):
+        '''
+        Yields the tokens one at a time, ending with EOF. Errors are raised
+        as ErrorSignal when the scan reaches them
+        '''
         while self.current_char != None:
             if self.current_char in ' \t':
                 self.advance()
 
             elif self.current_char in DIGITS:
-                tokens.append(self.make_number())
+                yield self.make_number()
 
             elif self.current_char in LETTERS:
-                tokens.append(self.make_identifier())
+                yield self.make_identifier()
             
             elif self.current_char in '\'"':
-                tokens.append(self.make_string())
+                yield self.make_string()
 
             elif self.current_char == '-':
-                tokens.append(self.make_minus_or_arrow())
+                yield self.make_minus_or_arrow()
 
             elif self.current_char == '+':
-                token = Token(TT_PLUS, pos_start=self.pos)
-                tokens.append(token)
+                yield Token(TT_PLUS, None, self.source, self.idx)
                 self.advance()
 
             elif self.current_char == '*':
-                token = Token(TT_MUL, pos_start=self.pos)
-                tokens.append(token)
+                yield Token(TT_MUL, None, self.source, self.idx)
                 self.advance()
 
             elif self.current_char == '/':
-                token = Token(TT_DIV, pos_start=self.pos)
-                tokens.append(token)
+                yield Token(TT_DIV, None, self.source, self.idx)
                 self.advance()
 
             elif self.current_char == '^':
-                token = Token(TT_POW, pos_start=self.pos)
-                tokens.append(token)
+                yield Token(TT_POW, None, self.source, self.idx)
                 self.advance()
 
             elif self.current_char == '(':
-                token = Token(TT_LPAREN, pos_start=self.pos)
-                tokens.append(token)
+                yield Token(TT_LPAREN, None, self.source, self.idx)
                 self.advance()
 
             elif self.current_char == ')':
-                token = Token(TT_RPAREN, pos_start=self.pos)
-                tokens.append(token)
+                yield Token(TT_RPAREN, None, self.source, self.idx)
                 self.advance()
 
             elif self.current_char == '!':
-                tok, error = self.make_not_equals()
-                if error: return [], error
-                tokens.append(tok)
+                yield self.make_not_equals()
 
             elif self.current_char == '=':
-                tokens.append(self.make_equals())
+                yield self.make_equals()
 
             elif self.current_char == '<':
-                tokens.append(self.make_less_than())
+                yield self.make_less_than()
 
             elif self.current_char == '>':
-                tokens.append(self.make_greater_than())
+                yield self.make_greater_than()
 
             elif self.current_char == ',':
-                token = Token(TT_COMMA, pos_start=self.pos)
-                tokens.append(token)
+                yield Token(TT_COMMA, None, self.source, self.idx)
                 self.advance()
 
             else:
-                pos_start = self.pos.copy()
+                pos_start = self.idx
                 char = self.current_char
                 self.advance()
-                tokens = []
-                return tokens, IllegalCharError(pos_start, self.pos, f'"{char}"')
+                raise ErrorSignal(IllegalCharError(self.source, pos_start, self.idx, f'"{char}"'))
         
         # Indicar fim de arquivo
-        token = Token(TT_EOF, pos_start=self.pos)
-        tokens.append(token)
-        return tokens, None
+        yield Token(TT_EOF, None, self.source, self.idx)
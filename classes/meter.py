@@ -0,0 +1,58 @@
+import time
+
+from classes.error import *
+
+
+### METERING ###
+# A run can be given fuel (how many loop iterations and calls it may make)
+# and a timeout. Every engine ticks the run's Meter on loop back edges and
+# calls, and only when there is one: without limits the cost is a None check
+# per loop and per call. Running out raises LimitExceededError at the loop or
+# call, with the usual traceback. Metered runs never vectorize loops (see
+# classes/vectorize.py), every iteration is paid for.
+
+CLOCK_EVERY = 1000 # Ticks between two reads of the clock
+
+def context_meter(context):
+    '''The meter of the run context belongs to, None without limits'''
+    options = context.options
+    return options and options.meter
+
+
+class Meter:
+    __slots__ = ('fuel', 'deadline', 'clock_in')
+
+    def __init__(self, fuel=None, timeout=None):
+        self.limit(fuel, timeout)
+
+    def limit(self, fuel=None, timeout=None):
+        '''Sets the limits, the timeout counts from now'''
+        if fuel is not None and fuel < 0: raise ValueError(f'fuel must be 0 or more, got {fuel}')
+        self.fuel     = fuel # Ticks left, None = unlimited
+        self.deadline = time.monotonic() + timeout if timeout is not None else None
+        self.clock_in = CLOCK_EVERY # Ticks before the clock is read again
+
+    def tick(self, node, context):
+        '''One loop iteration or call, made by node'''
+        self.advance(1, node, context)
+
+    def advance(self, count, node, context):
+        '''count ticks at once, at most until_check() of them'''
+        if self.fuel is not None:
+            self.fuel -= count
+            if self.fuel < 0: raise self.exceeded(node, context, 'out of fuel')
+
+        if self.deadline is not None:
+            self.clock_in -= count
+            if self.clock_in <= 0:
+                self.clock_in = CLOCK_EVERY
+                if time.monotonic() > self.deadline: raise self.exceeded(node, context, 'deadline passed')
+
+    def until_check(self):
+        '''Ticks that can pass before advance() may raise, for engines counting them themselves'''
+        ticks = CLOCK_EVERY if self.deadline is None else self.clock_in
+        if self.fuel is not None: ticks = min(ticks, self.fuel + 1)
+        return ticks
+
+    def exceeded(self, node, context, details):
+        return ErrorSignal(LimitExceededError(node.source, node.pos_start, node.pos_end, details, context))
@@ -1,6 +1,34 @@
 ### NODES ###
+# pos_start and pos_end are offsets into source, like the tokens'
+# 'source' isn't stored, nodes find it through their first token (see node_source)
+# 'address' and 'frame_names' are filled in by the Resolver
+# 'tail' is set on the calls a function body returns directly (see mark_tail_calls)
+# 'calls' lists the names a pure function body calls (see pure_calls)
+
+def node_source(node):
+    '''
+    The Source a node was parsed from: the one of a token it keeps, or of
+    the child it starts with. Walks in a loop, IF conditions and callees
+    can nest deeply
+    '''
+    while True:
+        node_type = type(node)
+        if node_type is BinOpNode or node_type is UnaryOpNode: return node.op_tok.source
+        if node_type is NumberNode or node_type is StringNode: return node.tok.source
+        if node_type is FuncDefNode:
+            name_tok = node.var_name_tok or (node.arg_name_toks and node.arg_name_toks[0])
+            if name_tok: return name_tok.source
+            node = node.node_to_call
+        elif node_type is IfNode:    node = node.cases[0][0]
+        elif node_type is WhileNode: node = node.condition_node
+        elif node_type is CallNode:  node = node.node_to_call
+        else: return node.var_name_tok.source # VarAccessNode, VarAssignNode, ForNode
+
 
 class NumberNode:
+    __slots__ = ('tok', 'pos_start', 'pos_end')
+    source = property(node_source)
+
     def __init__(self, tok):
         self.tok = tok
 
@@ -11,6 +39,9 @@ class NumberNode:
         return f'{self.tok}'
 
 class StringNode:
+    __slots__ = ('tok', 'pos_start', 'pos_end')
+    source = property(node_source)
+
     def __init__(self, tok):
         self.tok = tok
 
@@ -22,6 +53,9 @@ class StringNode:
 
 
 class VarAccessNode:
+    __slots__ = ('var_name_tok', 'pos_start', 'pos_end', 'address')
+    source = property(node_source)
+
     def __init__(self, var_name_tok):
         self.var_name_tok = var_name_tok
 
@@ -29,6 +63,9 @@ class VarAccessNode:
         self.pos_end   = self.var_name_tok.pos_end
 
 class VarAssignNode:
+    __slots__ = ('var_name_tok', 'value_node', 'pos_start', 'pos_end', 'address')
+    source = property(node_source)
+
     def __init__(self, var_name_tok, value_node):
         self.var_name_tok = var_name_tok
         self.value_node   = value_node
@@ -38,6 +75,9 @@ class VarAssignNode:
 
 
 class BinOpNode:
+    __slots__ = ('left_node', 'op_tok', 'right_node', 'pos_start', 'pos_end')
+    source = property(node_source)
+
     def __init__(self, left_node, op_tok, right_node):
         self.left_node  = left_node
         self.op_tok     = op_tok
@@ -47,9 +87,12 @@ class BinOpNode:
         self.pos_end   = self.right_node.pos_end
 
     def __repr__(self):
-        return f'({self.left_node}, {self.op_tok}, {self.right_node})'
+        return operators_repr(self)
 
 class UnaryOpNode:
+    __slots__ = ('op_tok', 'node', 'pos_start', 'pos_end')
+    source = property(node_source)
+
     def __init__(self, op_tok, node):
         self.op_tok = op_tok
         self.node   = node
@@ -58,10 +101,13 @@ class UnaryOpNode:
         self.pos_end   = self.node.pos_end
     
     def __repr__(self):
-        return f'({self.op_tok}, {self.node})'
+        return operators_repr(self)
 
 
 class IfNode:
+    __slots__ = ('cases', 'else_case', 'pos_start', 'pos_end')
+    source = property(node_source)
+
     def __init__(self, cases, else_case):
         self.cases = cases
         self.else_case = else_case
@@ -70,6 +116,10 @@ class IfNode:
         self.pos_end = (self.else_case or self.cases[-1][0]).pos_end
 
 class ForNode:
+    __slots__ = ('var_name_tok', 'start_value_node', 'end_value_node', 'step_value_node', 'body_node',
+                 'pos_start', 'pos_end', 'address')
+    source = property(node_source)
+
     def __init__(self, var_name_tok, start_value_node, end_value_node, step_value_node, body_node):
         self.var_name_tok     = var_name_tok 
         self.start_value_node = start_value_node
@@ -81,6 +131,9 @@ class ForNode:
         self.pos_end   = self.body_node.pos_end
 
 class WhileNode:
+    __slots__ = ('condition_node', 'body_node', 'pos_start', 'pos_end')
+    source = property(node_source)
+
     def __init__(self, condition_node, body_node):
        self.condition_node = condition_node 
        self.body_node      = body_node
@@ -90,10 +143,16 @@ class WhileNode:
 
 
 class FuncDefNode:
+    __slots__ = ('var_name_tok', 'arg_name_toks', 'node_to_call', 'pos_start', 'pos_end',
+                 'address', 'frame_names', 'calls')
+    source = property(node_source)
+
     def __init__(self, var_name_tok, arg_name_toks, node_to_call):
         self.var_name_tok  = var_name_tok
         self.arg_name_toks = arg_name_toks
         self.node_to_call  = node_to_call
+        mark_tail_calls(self.node_to_call)
+        self.calls = pure_calls(self)
 
         if self.var_name_tok: self.pos_start = self.var_name_tok.pos_start
         elif len(self.arg_name_toks) > 0: self.pos_start = self.arg_name_toks[0].pos_start
@@ -102,11 +161,117 @@ class FuncDefNode:
         self.pos_end = self.node_to_call.pos_end
 
 class CallNode:
+    __slots__ = ('node_to_call', 'arg_nodes', 'tail', 'pos_start', 'pos_end')
+    source = property(node_source)
+
     def __init__(self, node_to_call, arg_nodes):
         self.node_to_call = node_to_call
         self.arg_nodes = arg_nodes
+        self.tail = False
         self.pos_start = self.node_to_call.pos_start
 
         if len(self.arg_nodes) > 0: self.pos_end = self.arg_nodes[-1].pos_end # DIFF HERE TODO
         else: self.pos_end = self.node_to_call.pos_end
 
+
+def operators_repr(node):
+    '''
+    (left, op, right) for binary and (op, operand) for unary operators,
+    built with an explicit stack so deep expressions don't recurse in python
+    '''
+    parts, pending = [], [node]
+    while pending:
+        item = pending.pop()
+        if type(item) is str:
+            parts.append(item)
+        elif type(item) is BinOpNode:
+            pending.extend((')', item.right_node, f', {item.op_tok}, ', item.left_node, '('))
+        elif type(item) is UnaryOpNode:
+            pending.extend((')', item.node, f'({item.op_tok}, '))
+        else:
+            parts.append(repr(item))
+    return ''.join(parts)
+
+
+def mark_tail_calls(body_node):
+    '''
+    Flags the calls in tail position of a function body: the body itself or
+    the branches of IFs in tail position. Their value is the function's
+    value, so the engines run them without nesting a new call
+    '''
+    pending = [body_node]
+    while pending:
+        node = pending.pop()
+        if type(node) is CallNode:
+            node.tail = True
+        elif type(node) is IfNode:
+            pending.extend(expr for _, expr in node.cases)
+            if node.else_case: pending.append(node.else_case)
+
+
+def pure_calls(func_def_node):
+    '''
+    The names a function body calls, if the body is otherwise pure: it only
+    reads the function's arguments and uses operators, IFs and calls by
+    name. None if it assigns, loops, defines functions or calls something
+    else. What the names are bound to is only known when it is called
+    '''
+    arg_names = {arg_name_tok.value for arg_name_tok in func_def_node.arg_name_toks}
+    calls = {}
+    pending = [func_def_node.node_to_call]
+    while pending:
+        node = pending.pop()
+        node_type = type(node)
+        if node_type is NumberNode or node_type is StringNode:
+            continue
+        elif node_type is VarAccessNode:
+            if node.var_name_tok.value not in arg_names: return None
+        elif node_type is BinOpNode:
+            pending.extend((node.left_node, node.right_node))
+        elif node_type is UnaryOpNode:
+            pending.append(node.node)
+        elif node_type is IfNode:
+            for condition, expr in node.cases: pending.extend((condition, expr))
+            if node.else_case: pending.append(node.else_case)
+        elif node_type is CallNode:
+            callee = node.node_to_call
+            if type(callee) is not VarAccessNode or callee.var_name_tok.value in arg_names: return None
+            calls[callee.var_name_tok.value] = None
+            pending.extend(node.arg_nodes)
+        else:
+            return None
+    return tuple(calls)
+
+
+def child_nodes(node):
+    '''The nodes directly under node'''
+    node_type = type(node)
+    if node_type is BinOpNode:     return (node.left_node, node.right_node)
+    if node_type is UnaryOpNode:   return (node.node,)
+    if node_type is VarAssignNode: return (node.value_node,)
+    if node_type is IfNode:
+        children = [expr for case in node.cases for expr in case]
+        if node.else_case: children.append(node.else_case)
+        return children
+    if node_type is ForNode:
+        return [child for child in (node.start_value_node, node.end_value_node, node.step_value_node, node.body_node) if child]
+    if node_type is WhileNode:     return (node.condition_node, node.body_node)
+    if node_type is FuncDefNode:   return (node.node_to_call,)
+    if node_type is CallNode:      return [node.node_to_call, *node.arg_nodes]
+    return ()
+
+def subtree_nodes(node):
+    '''
+    Every node of the tree under node, children before their parent. Pickled
+    first in that order, the nodes are already stored when their parent
+    refers to them, so pickle doesn't recurse through a deep tree
+    '''
+    nodes, pending = [], [(node, False)]
+    while pending:
+        node, expanded = pending.pop()
+        if expanded:
+            nodes.append(node)
+            continue
+        pending.append((node, True))
+        pending.extend((child, False) for child in child_nodes(node))
+    return nodes
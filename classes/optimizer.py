@@ -0,0 +1,232 @@
+from constants     import *
+from classes.node  import *
+from classes.token import Token
+from classes.interpreter import Number, String
+from classes.compiler import BIN_OPS
+
+
+### OPTIMIZER ###
+# AST pass that runs after Parser.parse(), before any engine.
+#   level 0 -> nothing
+#   level 1 -> fold BinOpNode/UnaryOpNode subtrees whose leaves are literals
+#   level 2 -> also drop identities (x * 1, x + 0, x - 0, x ^ 1) when x is
+#              known to give a Number
+# Anything that fails when evaluated (division by zero, illegal operations,
+# python overflows) is left alone so the error still happens at runtime, and
+# so are results too big to build quickly (long strings, huge ints).
+
+MAX_FOLDED_STRING = 4096
+MAX_FOLDED_BITS   = 4096 # Ints products and powers can build, checked before computing them
+
+# Operators whose result is a Number (or an error) no matter the operands
+NUMERIC_OPS = (TT_MINUS, TT_DIV, TT_POW, TT_EE, TT_NE, TT_LT, TT_LTE, TT_GT, TT_GTE)
+
+# op -> (constant on the left is an identity, constant on the right is an identity)
+IDENTITIES = {
+    TT_PLUS:  (0, 0),
+    TT_MINUS: (None, 0),
+    TT_MUL:   (1, 1),
+    TT_POW:   (None, 1),
+}
+
+
+class Optimizer:
+    def __init__(self, level=1):
+        self.level  = level
+        self.folded = [] # One line per simplification, for reports
+
+    def optimize(self, node):
+        if self.level <= 0: return node
+        method_name = f'optimize_{type(node).__name__}'
+        method = getattr(self, method_name, self.no_optimize_method)
+        return method(node)
+
+    def no_optimize_method(self, node):
+        exception_msg = f'No optimize_{type(node).__name__} method defined'
+        raise Exception(exception_msg)
+
+    # Helpers
+    def constant(self, node):
+        '''The Value of a literal node, None for anything else'''
+        if isinstance(node, NumberNode): return Number.of(node.tok.value)
+        if isinstance(node, StringNode): return String(node.tok.value)
+        return None
+
+    def is_numeric(self, node):
+        '''True when evaluating node gives a Number or raises'''
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, NumberNode): continue
+            if isinstance(node, BinOpNode):
+                op = node.op_tok.type
+                if op in NUMERIC_OPS or op == TT_KEYWORD: continue
+                if op == TT_PLUS:
+                    pending.extend((node.left_node, node.right_node))
+                    continue
+                if op == TT_MUL:
+                    pending.append(node.left_node)
+                    continue
+            if isinstance(node, UnaryOpNode):
+                if node.op_tok.type == TT_KEYWORD: continue # NOT
+                pending.append(node.node)
+                continue
+            return False
+        return True
+
+    def literal(self, value, node):
+        '''Node for a folded value, spanning the node it replaces'''
+        if isinstance(value, String):
+            if len(value.value) > MAX_FOLDED_STRING: return None
+            return StringNode(Token(TT_STRING, value.value, node.source, node.pos_start, node.pos_end))
+
+        tok_type = TT_INT if type(value.value) is int else TT_FLOAT
+        return NumberNode(Token(tok_type, value.value, node.source, node.pos_start, node.pos_end))
+
+    def record(self, node, replacement):
+        ln, col = node.source.line_col(node.pos_start)
+        self.folded.append(f'{node.source.fn}:{ln + 1}:{col + 1} {node!r} => {replacement!r}')
+        return replacement
+
+    def evaluate(self, op, left, right=None):
+        try:
+            result, error = op(left, right) if right is not None else op(left)
+        except Exception:
+            # Python errors (overflows, "a" * 1.5...) are left for the runtime,
+            # the node may be in a branch that never runs
+            return None
+        return None if error else result
+
+    # Nodes
+    def optimize_NumberNode(self, node):
+        return node
+
+    def optimize_StringNode(self, node):
+        return node
+
+    def optimize_VarAccessNode(self, node):
+        return node
+
+    def optimize_VarAssignNode(self, node):
+        node.value_node = self.optimize(node.value_node)
+        return node
+
+    def optimize_BinOpNode(self, node):
+        return self.optimize_operators(node)
+
+    def optimize_UnaryOpNode(self, node):
+        return self.optimize_operators(node)
+
+    def optimize_operators(self, node):
+        '''
+        Optimizes a tree of BinOpNodes and UnaryOpNodes bottom up with an
+        explicit stack, deep expressions don't recurse in python
+        '''
+        results = []
+        pending = [(node, False)] # (node, operands already optimized)
+
+        while pending:
+            node, ready = pending.pop()
+            node_type = type(node)
+
+            if ready:
+                if node_type is BinOpNode:
+                    node.right_node = results.pop()
+                    node.left_node  = results.pop()
+                    results.append(self.fold_BinOpNode(node))
+                else:
+                    node.node = results.pop()
+                    results.append(self.fold_UnaryOpNode(node))
+            elif node_type is BinOpNode:
+                pending.append((node, True))
+                pending.append((node.right_node, False))
+                pending.append((node.left_node, False))
+            elif node_type is UnaryOpNode:
+                pending.append((node, True))
+                pending.append((node.node, False))
+            else:
+                results.append(self.optimize(node))
+
+        return results[0]
+
+    def fold_BinOpNode(self, node):
+        '''node's operands are already optimized'''
+        op_tok = node.op_tok
+
+        left, right = self.constant(node.left_node), self.constant(node.right_node)
+        if left is not None and right is not None:
+            if self.folds_too_big(op_tok, left, right): return node
+            key = op_tok.type if op_tok.type in BIN_OPS else (op_tok.type, op_tok.value)
+            result = self.evaluate(BIN_OPS[key], left, right)
+            replacement = self.literal(result, node) if result is not None else None
+            if replacement: return self.record(node, replacement)
+            return node
+
+        if self.level >= 2 and op_tok.type in IDENTITIES:
+            left_identity, right_identity = IDENTITIES[op_tok.type]
+            if self.is_identity(right, right_identity) and self.is_numeric(node.left_node):
+                return self.record(node, node.left_node)
+            if self.is_identity(left, left_identity) and self.is_numeric(node.right_node):
+                return self.record(node, node.right_node)
+
+        return node
+
+    def folds_too_big(self, op_tok, left, right):
+        '''
+        String repetitions, int products and int powers are measured before
+        being computed, they can take any memory and time
+        '''
+        op = op_tok.type
+        if op not in (TT_MUL, TT_POW) or not isinstance(right, Number) or type(right.value) is not int: return False
+        if isinstance(left, String):
+            return op == TT_MUL and len(left.value) * right.value > MAX_FOLDED_STRING
+        if not isinstance(left, Number) or type(left.value) is not int: return False
+        if op == TT_MUL: return left.value.bit_length() + right.value.bit_length() > MAX_FOLDED_BITS
+        # Negative exponents give floats
+        return right.value * left.value.bit_length() > MAX_FOLDED_BITS
+
+    def is_identity(self, value, identity):
+        # Only int constants: x + 0.0 would turn an int into a float
+        return (identity is not None and isinstance(value, Number)
+                and type(value.value) is int and value.value == identity)
+
+    def fold_UnaryOpNode(self, node):
+        operand = self.constant(node.node)
+        if operand is None: return node
+
+        if node.op_tok.type == TT_MINUS:
+            result = self.evaluate(lambda value: value.multiplied_by(Number.minus_one), operand)
+        elif node.op_tok.matches(TT_KEYWORD, 'NOT'):
+            result = self.evaluate(lambda value: value.notted(), operand)
+        else:
+            result = operand
+
+        replacement = self.literal(result, node) if result is not None else None
+        if replacement: return self.record(node, replacement)
+        return node
+
+    def optimize_IfNode(self, node):
+        node.cases = [(self.optimize(condition), self.optimize(expr)) for condition, expr in node.cases]
+        if node.else_case: node.else_case = self.optimize(node.else_case)
+        return node
+
+    def optimize_ForNode(self, node):
+        node.start_value_node = self.optimize(node.start_value_node)
+        node.end_value_node   = self.optimize(node.end_value_node)
+        if node.step_value_node: node.step_value_node = self.optimize(node.step_value_node)
+        node.body_node = self.optimize(node.body_node)
+        return node
+
+    def optimize_WhileNode(self, node):
+        node.condition_node = self.optimize(node.condition_node)
+        node.body_node = self.optimize(node.body_node)
+        return node
+
+    def optimize_FuncDefNode(self, node):
+        node.node_to_call = self.optimize(node.node_to_call)
+        return node
+
+    def optimize_CallNode(self, node):
+        node.node_to_call = self.optimize(node.node_to_call)
+        node.arg_nodes = [self.optimize(arg_node) for arg_node in node.arg_nodes]
+        return node
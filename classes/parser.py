@@ -4,75 +4,113 @@ from classes.node  import *
 
 
 class ParseResult:
+    '''What parse() returns: the AST or the syntax error'''
+    __slots__ = ('error', 'node')
+
     def __init__(self):
         self.error, self.node = None, None
-        self.advance_count = 0
-
-    def register_advancement(self):
-        self.advance_count += 1
-    
-    def register(self, res):
-        self.advance_count += res.advance_count
-        if res.error: self.error = res.error
-        return res.node
         
     def success(self, node):
         self.node = node
         return self
 
     def failure(self, error):
-        if not self.error or self.advance_count == 0:
-            self.error = error
+        self.error = error
         return self
 
 
+### BINDING POWERS ###
+# Binary operators are parsed by precedence climbing: an operator only joins
+# the expression being built when it binds at least as tightly as the level
+# that expression was started at. Higher binds tighter. The levels follow the
+# grammar in the README:
+#     expr (AND, OR) > comp-expr (==, <, ...) > arith-expr (+, -) > term (*, /) > power (^)
+# ^ is right associative (its right operand is a factor), everything else
+# is left associative.
+
+BP_LOGIC = 1
+BP_COMP  = 2
+BP_ARITH = 3
+BP_TERM  = 4
+BP_POWER = 5
+
+BINARY_POWER = {
+    TT_EE: BP_COMP,  TT_NE:  BP_COMP, TT_LT: BP_COMP, TT_LTE: BP_COMP, TT_GT: BP_COMP, TT_GTE: BP_COMP,
+    TT_PLUS:  BP_ARITH, TT_MINUS: BP_ARITH,
+    TT_MUL:   BP_TERM,  TT_DIV:   BP_TERM,
+    TT_POW:   BP_POWER,
+    'AND': BP_LOGIC, 'OR': BP_LOGIC, # Keywords, looked up by value
+}
+
+# Entries of the stack used by Parser.binary()
+BINARY, UNARY, PAREN, GUARD = range(4)
+
+COMP_EXPR_ERROR  = "Expected int, float, identifier, '+', '-', '(' or 'NOT'"
+EXPRESSION_ERROR = "Expected 'VAR', int, float, identifier, 'IF', 'FOR', WHILE', 'FUN', '+', '-' or '('"
+
+
 class Parser:
+    '''
+    tokens can be a list or any iterator, like a lexer's stream(). Tokens are
+    pulled one at a time and only the current one is kept, so a streamed
+    program is never held as a whole token list.
+    tok_idx counts the tokens consumed so far
+    '''
     def __init__(self, tokens):
-        self.tokens  = tokens
+        self.tokens  = iter(tokens)
         self.tok_idx = -1
+        self.current_tok = None
         self.advance()
 
     def parse(self):
-        result = self.expression()
-        if not result.error and self.current_tok.type != TT_EOF:
+        try:
+            return ParseResult().success(self.parse_program())
+        except ErrorSignal as signal:
+            return ParseResult().failure(signal.error)
+
+    def parse_program(self):
+        '''
+        Returns the AST, syntax errors are raised as ErrorSignal.
+        Grammar methods return plain nodes, the error to report is the first
+        one raised unless a rule that consumed no tokens replaces it with a
+        more general message (see binary)
+        '''
+        node = self.expression()
+        if self.current_tok.type != TT_EOF:
             error_msg = "Expected '+', '-', '*', '/' or '^'"
-            return result.failure(
-                    InvalidSyntaxError(
-                        self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                        self.current_tok.source, self.current_tok.pos_start, 
                         self.current_tok.pos_end, 
                         error_msg)
                     )
-        return result
+        return node
 
     def advance(self):
+        # Past the end it stays on EOF
         self.tok_idx += 1
-        if self.tok_idx < len(self.tokens):
-            self.current_tok = self.tokens[self.tok_idx]
+        self.current_tok = next(self.tokens, self.current_tok)
         return self.current_tok
 
     def func_def(self):
-        res = ParseResult()
 
         # Check 'FOR' KEYWORD
         if not self.current_tok.matches(TT_KEYWORD, 'FUN'):
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected 'FUN'"
             ))
-        res.register_advancement()
         self.advance()
 
         # Check identifier
         if self.current_tok.type == TT_IDENTIFIER:
             #Store the function name
             var_name_tok = self.current_tok
-            res.register_advancement()
             self.advance()
     
             if self.current_tok.type != TT_LPAREN:
-                return res.failure(InvalidSyntaxError(
-                    self.current_tok.pos_start, 
+                raise ErrorSignal(InvalidSyntaxError(
+                    self.current_tok.source, self.current_tok.pos_start, 
                     self.current_tok.pos_end,
                     f"Expected '('"
                 ))
@@ -80,12 +118,11 @@ class Parser:
         else:
             var_name_tok = None
             if self.current_tok.type != TT_LPAREN:
-                return res.failure(InvalidSyntaxError(
-                    self.current_tok.pos_start, 
+                raise ErrorSignal(InvalidSyntaxError(
+                    self.current_tok.source, self.current_tok.pos_start, 
                     self.current_tok.pos_end,
                     f"Expected identifier or '('"
                 ))
-        res.register_advancement()
         self.advance()
         arg_name_toks = []
 
@@ -93,29 +130,26 @@ class Parser:
         if self.current_tok.type == TT_IDENTIFIER:
             #Store the arg name
             arg_name_toks.append(self.current_tok)
-            res.register_advancement()
             self.advance()
 
             while self.current_tok.type == TT_COMMA:
-                res.register_advancement()
                 self.advance()
 
                 # Check func arguments
                 if self.current_tok.type != TT_IDENTIFIER:
-                    return res.failure(InvalidSyntaxError(
-                        self.current_tok.pos_start, 
+                    raise ErrorSignal(InvalidSyntaxError(
+                        self.current_tok.source, self.current_tok.pos_start, 
                         self.current_tok.pos_end,
                         f"Expected identifier"
                     ))
                 #Store the arg name
                 arg_name_toks.append(self.current_tok)
-                res.register_advancement()
                 self.advance()
                 
             # Check RPAREN (case when func has args)
             if self.current_tok.type != TT_RPAREN:
-                return res.failure(InvalidSyntaxError(
-                    self.current_tok.pos_start, 
+                raise ErrorSignal(InvalidSyntaxError(
+                    self.current_tok.source, self.current_tok.pos_start, 
                     self.current_tok.pos_end,
                     f"Expected ')' or ','"
                 ))
@@ -123,414 +157,363 @@ class Parser:
         # Check RPAREN (case func doesnt have args)
         else:
             if self.current_tok.type != TT_RPAREN:
-                return res.failure(InvalidSyntaxError(
-                    self.current_tok.pos_start, 
+                raise ErrorSignal(InvalidSyntaxError(
+                    self.current_tok.source, self.current_tok.pos_start, 
                     self.current_tok.pos_end,
                     f"Expected ')' or 'identifier'"
                 ))
 
-        res.register_advancement()
         self.advance()
 
         # Check arrow
         if self.current_tok.type != TT_ARROW:
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected ->"
             ))
-        res.register_advancement()
         self.advance()
 
-        body_node = res.register(self.expression())
-        if res.error: return res
-        return res.success(FuncDefNode(var_name_tok, 
-                                       arg_name_toks, 
-                                       body_node))
+        body_node = self.expression()
+        return FuncDefNode(var_name_tok, 
+                           arg_name_toks, 
+                           body_node)
 
 
 
 
     def for_expr(self):
-        res = ParseResult()
 
         # Check 'FOR' KEYWORD
         if not self.current_tok.matches(TT_KEYWORD, 'FOR'):
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected 'FOR'"
             ))
-        res.register_advancement()
         self.advance()
 
         # Check identifier
         if self.current_tok.type != TT_IDENTIFIER:
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected identifier"
             ))
 
         #Store the variable name
         var_name = self.current_tok
-        res.register_advancement()
         self.advance()
         # Check '='
         if self.current_tok.type != TT_EQ:
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected '='"
             ))
-        res.register_advancement()
         self.advance()
         
         # Assign the result of the expression as the start_value of the for loop
-        start_value = res.register(self.expression())
-        if res.error: return res
+        start_value = self.expression()
         
         # Check 'TO' keyword
         if not self.current_tok.matches(TT_KEYWORD, 'TO'):
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected 'TO'"
             ))
-        res.register_advancement()
         self.advance()
 
         # Assign the result of the expression as the end_value of the for loop
-        end_value = res.register(self.expression())
-        if res.error: return res
+        end_value = self.expression()
         # Check if a custom STEP value is present
         if self.current_tok.matches(TT_KEYWORD, 'STEP'):
-            res.register_advancement()
             self.advance()
 
-            step_value = res.register(self.expression())
-            if res.error: return res
+            step_value = self.expression()
         else:
             step_value = None
 
         # Check 'THEN' keyword
         if not self.current_tok.matches(TT_KEYWORD, 'THEN'):
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected 'THEN'"
             ))
-        res.register_advancement()
         self.advance()
 
         # 
-        body = res.register(self.expression())
-        if res.error: return res
-        return res.success(ForNode(var_name, 
-                                   start_value, 
-                                   end_value, 
-                                   step_value, 
-                                   body))
+        body = self.expression()
+        return ForNode(var_name, 
+                       start_value, 
+                       end_value, 
+                       step_value, 
+                       body)
 
     def while_expr(self):
-        res = ParseResult()
 
         # Check 'WHILE' KEYWORD
         if not self.current_tok.matches(TT_KEYWORD, 'WHILE'):
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected 'WHILE'"
             ))
-        res.register_advancement()
         self.advance()
 
-        condition = res.register(self.expression())
-        if res.error: return res
+        condition = self.expression()
 
         # Check 'THEN' keyword
         if not self.current_tok.matches(TT_KEYWORD, 'THEN'):
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected 'THEN'"
             ))
-        res.register_advancement()
         self.advance()
 
         # 
-        body = res.register(self.expression())
-        if res.error: return res
-        return res.success(WhileNode(condition, body))
+        body = self.expression()
+        return WhileNode(condition, body)
 
     def if_expr(self):
-        res = ParseResult()
         cases = []
         else_case = None
         
         # Check IF 
         if not self.current_tok.matches(TT_KEYWORD, 'IF'):
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected 'IF'"
             ))
 
-        res.register_advancement()
         self.advance()
 
-        condition = res.register(self.expression())
-        if res.error: return res
+        condition = self.expression()
         
         # Check Then
         if not self.current_tok.matches(TT_KEYWORD, 'THEN'):
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start, 
+            raise ErrorSignal(InvalidSyntaxError(
+                self.current_tok.source, self.current_tok.pos_start, 
                 self.current_tok.pos_end,
                 f"Expected 'THEN'"
             ))
 
-        res.register_advancement()
         self.advance()
 
-        expr = res.register(self.expression())
-        if res.error: return res
+        expr = self.expression()
         cases.append((condition, expr))
         
         # Check multiple ELIF's
         while self.current_tok.matches(TT_KEYWORD, 'ELIF'):
-            res.register_advancement()
             self.advance()
 
-            condition = res.register(self.expression())
-            if res.error: return res
+            condition = self.expression()
             
             # Check Then
             if not self.current_tok.matches(TT_KEYWORD, 'THEN'):
-                return res.failure(InvalidSyntaxError(
-                    self.current_tok.pos_start, 
+                raise ErrorSignal(InvalidSyntaxError(
+                    self.current_tok.source, self.current_tok.pos_start, 
                     self.current_tok.pos_end,
                     f"Expected 'THEN'"
                 ))
 
-            res.register_advancement()
             self.advance()
 
-            expr = res.register(self.expression())
-            if res.error: return res
+            expr = self.expression()
             cases.append((condition, expr))
 
         if self.current_tok.matches(TT_KEYWORD, 'ELSE'):
-            res.register_advancement()
             self.advance()
 
-            else_case = res.register(self.expression())
-            if res.error: return res
+            else_case = self.expression()
 
-        return res.success(IfNode(cases, else_case))
+        return IfNode(cases, else_case)
 
 
     def atom(self):
-        res = ParseResult()
         tok = self.current_tok
 
         if tok.type in (TT_INT, TT_FLOAT):
-            res.register_advancement()
             self.advance()
-            return res.success(NumberNode(tok))
+            return NumberNode(tok)
 
         elif tok.type == TT_STRING:
-            res.register_advancement()
             self.advance()
-            return res.success(StringNode(tok))
+            return StringNode(tok)
 
         elif tok.type == TT_IDENTIFIER:
-            res.register_advancement()
             self.advance()
-            return res.success(VarAccessNode(tok))
+            return VarAccessNode(tok)
         
-        elif tok.type == TT_LPAREN:
-            res.register_advancement()
-            self.advance()
-            expression = res.register(self.expression())
-            if res.error: return res
-            if self.current_tok.type == TT_RPAREN:
-                res.register_advancement()
-                self.advance()
-                return res.success(expression)
-            else:
-                error_msg = "Expected ')'" 
-                return res.failure(InvalidSyntaxError(
-                        self.current_tok.pos_start,
-                        self.current_tok.pos_end,
-                        error_msg
-                    ))
         elif tok.matches(TT_KEYWORD, 'IF'):
-            if_expr = res.register(self.if_expr())
-            if res.error: return res
-            return res.success(if_expr)
+            return self.if_expr()
 
 
         elif tok.matches(TT_KEYWORD, 'FOR'):
-            for_expr = res.register(self.for_expr())
-            if res.error: return res
-            return res.success(for_expr)
+            return self.for_expr()
 
         elif tok.matches(TT_KEYWORD, 'WHILE'):
-            while_expr = res.register(self.while_expr())
-            if res.error: return res
-            return res.success(while_expr)
+            return self.while_expr()
 
         elif tok.matches(TT_KEYWORD, 'FUN'):
-            func_def = res.register(self.func_def())
-            if res.error: return res
-            return res.success(func_def)
+            return self.func_def()
 
         error_msg = "Expected int, float, identifier, '+', '-', '(', 'IF', 'FOR', WHILE', 'FUN'"
-        return res.failure(InvalidSyntaxError(tok.pos_start, tok.pos_end, error_msg))
-
-    def power(self):
-        return self.bin_op(self.call, (TT_POW, ), self.factor) 
-
-    def call(self):
-        res = ParseResult()
-        atom = res.register(self.atom())
-        if res.error: return res
+        raise ErrorSignal(InvalidSyntaxError(tok.source, tok.pos_start, tok.pos_end, error_msg))
 
+    def call(self, atom):
+        '''The call of atom when it's followed by an argument list, atom otherwise'''
         arg_nodes = []
         if self.current_tok.type == TT_LPAREN:
-            res.register_advancement()
             self.advance()
             
             if self.current_tok.type == TT_RPAREN:
-                res.register_advancement()
                 self.advance()
             else:
                 # Register function arguments
-                expr = res.register(self.expression())
-                if res.error: 
-                    return res.failure(InvalidSyntaxError(
-                        self.current_tok.pos_start,
-                        self.current_tok.pos_end,
-                        "Expected ')', 'VAR', 'IF', 'FOR', 'WHILE', 'FUN', int, float, identifier, '+', '-'"))
-
+                expr = self.expression()
                 arg_nodes.append(expr)
 
                 while self.current_tok.type == TT_COMMA:
-                    res.register_advancement()
                     self.advance()
 
-                    expr = res.register(self.expression())
-                    if res.error: return res
+                    expr = self.expression()
                     arg_nodes.append(expr)
                     
                 # Check RPAREN (case when func has args)
                 if self.current_tok.type != TT_RPAREN:
-                    return res.failure(InvalidSyntaxError(
-                        self.current_tok.pos_start, 
+                    raise ErrorSignal(InvalidSyntaxError(
+                        self.current_tok.source, self.current_tok.pos_start, 
                         self.current_tok.pos_end,
                         f"Expected ')' or ','"
                     ))
 
-                res.register_advancement()
                 self.advance()
-            return res.success(CallNode(atom, arg_nodes))
+            return CallNode(atom, arg_nodes)
         # If there's no parenthesis, dont 'call the function', just pass the value of the atom.
-        return res.success(atom)
-
-
-    def factor(self):
-        res = ParseResult()
-        tok = self.current_tok
-
-        if tok.type in (TT_PLUS, TT_MINUS):
-            res.register_advancement()
-            self.advance()
-            factor = res.register(self.factor())
-            if res.error: return res
-            return res.success(UnaryOpNode(tok, factor))
-
-        return self.power()
-
-    def term(self):
-        return self.bin_op(self.factor, (TT_MUL, TT_DIV))
-
-    def arith_expr(self):
-        return self.bin_op(self.term, (TT_PLUS, TT_MINUS))
-
-    def comp_expr(self):
-        res = ParseResult()
-        if self.current_tok.matches(TT_KEYWORD, 'NOT'):
-            op_tok = self.current_tok
-            res.register_advancement()
-            self.advance()
-
-            node = res.register(self.comp_expr())
-            if res.error: return res
-            return res.success(UnaryOpNode(op_tok, node))
-
-        node = res.register(self.bin_op(self.arith_expr, (TT_EE, TT_NE, TT_LT, TT_LTE, TT_GT, TT_GTE)))
-        if res.error:
-            error_msg = "Expected int, float, identifier, '+', '-', '(' or 'NOT'"
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start,
-                self.current_tok.pos_end, 
-                error_msg
-            ))
-        
-        return res.success(node)
-
+        return atom
 
 
     def expression(self):
-        res = ParseResult()
         if self.current_tok.matches(TT_KEYWORD, 'VAR'):
-            res.register_advancement()
             self.advance()
 
             if self.current_tok.type != TT_IDENTIFIER:
                 error_msg = "Expected identifier"
-                return res.failure(InvalidSyntaxError(
-                    self.current_tok.pos_start, self.current_tok.pos_end, error_msg))
+                raise ErrorSignal(InvalidSyntaxError(
+                    self.current_tok.source, self.current_tok.pos_start, self.current_tok.pos_end, error_msg))
 
             var_name = self.current_tok
-            res.register_advancement()
             self.advance()
 
             if self.current_tok.type != TT_EQ:
                 error_msg = "Expected '='"
-                return res.failure(InvalidSyntaxError(
-                    self.current_tok.pos_start, self.current_tok.pos_end, error_msg))
-
-            res.register_advancement()
-            self.advance()
-            expression = res.register(self.expression())
-            if res.error: return res
-            return res.success(VarAssignNode(var_name, expression))
-
-        node = res.register(self.bin_op(self.comp_expr, ((TT_KEYWORD, 'AND'), (TT_KEYWORD, 'OR'))))
-        if res.error: 
-            return res.failure(InvalidSyntaxError(
-                self.current_tok.pos_start,
-                self.current_tok.pos_end,
-                "Expected 'VAR', int, float, identifier, 'IF', 'FOR', WHILE', 'FUN', '+', '-' or '('"
-                ))
+                raise ErrorSignal(InvalidSyntaxError(
+                    self.current_tok.source, self.current_tok.pos_start, self.current_tok.pos_end, error_msg))
 
-        return res.success(node)
-
-    def bin_op(self, func_a, ops, func_b=None):
-        if not func_b: func_b = func_a
-
-        res  = ParseResult()
-        left = res.register(func_a()) 
-        if res.error: return res
-        while self.current_tok.type in ops or (self.current_tok.type, self.current_tok.value) in ops:
-            op_tok = self.current_tok
-            res.register_advancement()
             self.advance()
-            if res.error: return res
-            right  = res.register(func_b())
-            if res.error: return res
-            left   = BinOpNode(left, op_tok, right)
-        
-        return res.success(left)
+            expression = self.expression()
+            return VarAssignNode(var_name, expression)
+
+        return self.binary(0, EXPRESSION_ERROR)
+
+    def binary(self, min_power, error_msg=None):
+        '''
+        Parses the operators binding at min_power or tighter, with unary
+        operators, parentheses and calls, using an explicit stack instead of
+        recursing for each operand, so long chains and deep nesting are only
+        limited by memory.
+
+        Each entry of the stack is what to do once the operand being parsed
+        is complete (the operand "returns" when the next operator binds less
+        than its min_power):
+            (BINARY, min_power, left, op_tok) -> BinOpNode(left, op_tok, operand)
+            (UNARY,  min_power, op_tok)       -> UnaryOpNode(op_tok, operand)
+            (PAREN,  min_power)               -> expect ')', then maybe a call
+            (GUARD,  start_idx, error_msg)    -> nothing, see below
+        min_power is the one to go back to after handling the entry.
+
+        A GUARD covers one operand: an error raised before any of its tokens
+        is consumed gets its more general message instead (the outermost
+        guard that started at the current token wins). This is where the
+        comp-expr and expr rules of the grammar give their messages.
+        '''
+        stack = [(GUARD, self.tok_idx, error_msg)] if error_msg else []
+        try:
+            while True:
+                # Operand: prefix operators and '(' start a nested operand, anything else is an atom
+                tok = self.current_tok
+                if min_power <= BP_COMP and tok.matches(TT_KEYWORD, 'NOT'):
+                    # NOT starts a comp-expr, so it's only allowed where one can start
+                    self.advance()
+                    stack.append((UNARY, min_power, tok))
+                    stack.append((GUARD, self.tok_idx, COMP_EXPR_ERROR))
+                    min_power = BP_COMP
+                    continue
+                if tok.type in (TT_PLUS, TT_MINUS):
+                    self.advance()
+                    stack.append((UNARY, min_power, tok))
+                    min_power = BP_POWER
+                    continue
+                if tok.type == TT_LPAREN:
+                    self.advance()
+                    stack.append((PAREN, min_power))
+                    if not self.current_tok.matches(TT_KEYWORD, 'VAR'):
+                        stack.append((GUARD, self.tok_idx, EXPRESSION_ERROR))
+                        min_power = 0
+                        continue
+                    left, min_power = self.expression(), 0
+                else:
+                    left = self.call(self.atom())
+
+                # Operators: extend left while they bind tightly enough, then hand
+                # the finished operand to the entries on the stack
+                while True:
+                    op_tok = self.current_tok
+                    op_type = op_tok.type
+                    power = BINARY_POWER.get(op_tok.value if op_type == TT_KEYWORD else op_type)
+                    if power is not None and power >= min_power:
+                        self.advance()
+                        stack.append((BINARY, min_power, left, op_tok))
+                        if power == BP_LOGIC:
+                            stack.append((GUARD, self.tok_idx, COMP_EXPR_ERROR))
+                            min_power = BP_COMP
+                        elif power == BP_POWER: min_power = BP_POWER # Right associative
+                        else:                   min_power = power + 1
+                        break
+
+                    while stack and stack[-1][0] == GUARD: stack.pop()
+                    if not stack: return left
+
+                    entry = stack.pop()
+                    kind, min_power = entry[0], entry[1]
+                    if kind == BINARY:
+                        left = BinOpNode(entry[2], entry[3], left)
+                    elif kind == UNARY:
+                        left = UnaryOpNode(entry[2], left)
+                    else:
+                        if self.current_tok.type != TT_RPAREN:
+                            raise ErrorSignal(InvalidSyntaxError(
+                                self.current_tok.source,
+                                self.current_tok.pos_start,
+                                self.current_tok.pos_end,
+                                "Expected ')'"
+                            ))
+                        self.advance()
+                        left = self.call(left)
+
+        except ErrorSignal:
+            for entry in stack:
+                # Replace the error if no token was consumed since the guard started
+                if entry[0] == GUARD and entry[1] == self.tok_idx:
+                    raise ErrorSignal(InvalidSyntaxError(
+                        self.current_tok.source,
+                        self.current_tok.pos_start,
+                        self.current_tok.pos_end,
+                        entry[2]
+                    ))
+            raise
@@ -0,0 +1,161 @@
+import time
+
+from classes.interpreter import Interpreter, Function, TailCall
+from classes.meter import Meter
+
+
+### PROFILER ###
+# run(..., profile=Profiler()) runs the tree engine with a ProfilingInterpreter
+# and fills the profiler with:
+#   per function name -> calls, inclusive and exclusive seconds
+#   per node          -> evaluations of BinOpNodes and CallNodes, iterations of
+#                        ForNodes and WhileNodes
+#   per call stack    -> exclusive seconds, for flame graphs (collapsed())
+# The profiler is the run's Meter: engines already tick it on every loop
+# iteration and call, and it keeps enforcing fuel and timeout. Metered runs
+# aren't vectorized, so every iteration is counted. Without a profiler none
+# of this code runs.
+
+class Profiler(Meter):
+    __slots__ = ('counts', 'calls', 'inclusive', 'exclusive', 'paths', 'path_keys', 'path_times', 'frames', 'active')
+
+    def __init__(self, fuel=None, timeout=None):
+        super().__init__(fuel, timeout)
+        self.counts    = {} # node -> evaluations (iterations for loops)
+        self.calls     = {} # function name -> calls
+        self.inclusive = {} # function name -> seconds, recursive calls counted once
+        self.exclusive = {} # function name -> seconds not spent in the functions it called
+
+        # Call stacks are interned as paths: path 0 is the empty stack, path
+        # (parent path, name) the stack parent path is the top of
+        self.paths      = {}
+        self.path_keys  = [None]
+        self.path_times = [0.0] # Exclusive seconds
+
+        self.frames = [] # [name, path, start, seconds in callees] of the running functions
+        self.active = {} # function name -> frames running it
+
+    # Collecting
+    def tick(self, node, context):
+        self.counts[node] = self.counts.get(node, 0) + 1
+        self.advance(1, node, context)
+
+    def count(self, node):
+        self.counts[node] = self.counts.get(node, 0) + 1
+
+    def enter(self, name):
+        parent = self.frames[-1][1] if self.frames else 0
+        path = self.paths.get((parent, name))
+        if path is None:
+            path = self.paths[(parent, name)] = len(self.path_keys)
+            self.path_keys.append((parent, name))
+            self.path_times.append(0.0)
+
+        self.calls[name]  = self.calls.get(name, 0) + 1
+        self.active[name] = self.active.get(name, 0) + 1
+        self.frames.append([name, path, time.perf_counter(), 0.0])
+
+    def exit(self):
+        name, path, start, callees = self.frames.pop()
+        seconds = time.perf_counter() - start
+
+        self.exclusive[name] = self.exclusive.get(name, 0.0) + seconds - callees
+        self.path_times[path] += seconds - callees
+        self.active[name] -= 1
+        if not self.active[name]: self.inclusive[name] = self.inclusive.get(name, 0.0) + seconds
+        if self.frames: self.frames[-1][3] += seconds
+
+    # Results
+    def function_stats(self):
+        return {
+            name: {
+                'calls':     calls,
+                'inclusive': self.inclusive.get(name, 0.0),
+                'exclusive': self.exclusive.get(name, 0.0),
+            }
+            for name, calls in self.calls.items()
+        }
+
+    def node_stats(self):
+        '''One entry per counted node, most counted first. Nested nodes can share a start, not a span'''
+        stats = []
+        for node, count in self.counts.items():
+            ln, col = node.source.line_col(node.pos_start)
+            # pos_end is past the node, its column is the last character's 1 based one
+            end_ln, end_col = node.source.line_col(node.pos_end)
+            stats.append({
+                'node':       type(node).__name__,
+                'file':       node.source.fn,
+                'line':       ln + 1,
+                'column':     col + 1,
+                'end_line':   end_ln + 1,
+                'end_column': end_col,
+                'count':      count,
+            })
+        stats.sort(key=lambda entry: entry['count'], reverse=True)
+        return stats
+
+    def collapsed(self):
+        '''
+        One line per call stack, 'outer;inner microseconds' (exclusive time),
+        the input of flamegraph.pl, speedscope, inferno...
+        '''
+        names = [None] * len(self.path_keys)
+        lines = []
+        for path in range(1, len(self.path_keys)):
+            parent, name = self.path_keys[path]
+            # Parents are interned before their children
+            names[path] = f'{names[parent]};{name}' if parent else name
+            microseconds = round(self.path_times[path] * 1e6)
+            if microseconds: lines.append(f'{names[path]} {microseconds}')
+        return '\n'.join(lines)
+
+    def report(self, limit=20):
+        lines = [f'{"function":<24} {"calls":>8} {"inclusive ms":>13} {"exclusive ms":>13}']
+        functions = sorted(self.function_stats().items(), key=lambda item: item[1]['inclusive'], reverse=True)
+        for name, stats in functions[:limit]:
+            lines.append(f'{name:<24} {stats["calls"]:>8} {stats["inclusive"] * 1e3:>13.3f} {stats["exclusive"] * 1e3:>13.3f}')
+
+        lines.append('')
+        lines.append(f'{"node":<12} {"position":<36} {"count":>10}')
+        for stats in self.node_stats()[:limit]:
+            position = f'{stats["file"]}:{stats["line"]}:{stats["column"]}-{stats["end_line"]}:{stats["end_column"]}'
+            lines.append(f'{stats["node"]:<12} {position:<36} {stats["count"]:>10}')
+        return '\n'.join(lines)
+
+
+class ProfilingInterpreter(Interpreter):
+    '''Interpreter reporting operators and calls to a Profiler'''
+    def __init__(self, profiler):
+        self.profiler = profiler
+
+    def run(self, node, context):
+        self.profiler.enter(context.display_name)
+        try:
+            return self.visit(node, context)
+        finally:
+            self.profiler.exit()
+
+    def binary_op(self, node, left, right, context):
+        self.profiler.count(node)
+        return super().binary_op(node, left, right, context)
+
+    def visit_CallNode(self, node, context):
+        profiler = self.profiler
+        value_to_call = self.visit(node.node_to_call, context)
+        args = [self.visit(arg_node, context) for arg_node in node.arg_nodes]
+        # Counts the call, and charges the fuel like Interpreter.visit_CallNode
+        profiler.tick(node, context)
+
+        if node.tail and type(value_to_call) is Function:
+            # The caller is done, its frame goes to the callee Function.execute runs next
+            profiler.exit()
+            profiler.enter(value_to_call.name)
+            return TailCall(value_to_call, args, node)
+
+        profiler.enter(value_to_call.name)
+        try:
+            if type(value_to_call) is Function: return value_to_call.execute(args, context, node, self)
+            return value_to_call.execute(args, context, node)
+        finally:
+            profiler.exit()
@@ -0,0 +1,135 @@
+from classes.node import *
+
+
+### RESOLVER ###
+# Runs between Parser.parse() and the closure compiler. Every variable access
+# and assignment inside a function gets the slot the name has in the
+# function's frame, or None when the function doesn't declare it.
+#
+# A function's slots are its arguments followed by every name it declares
+# with VAR, FOR or FUN (declarations are hoisted to the start of the function).
+# Scoping is dynamic like on the tree engine: a name that isn't in the frame,
+# or whose slot isn't set yet (its declaration hasn't run, maybe never, in an
+# IF), is read from the callers' frames at run time, then from the globals
+# (see compiler.outer_load). Names outside of functions are globals.
+
+class Scope:
+    def __init__(self, arg_names):
+        self.slots = {}
+        for arg_name in arg_names: self.declare(arg_name)
+
+    def declare(self, name):
+        if name not in self.slots:
+            self.slots[name] = len(self.slots)
+        return self.slots[name]
+
+
+class Resolver:
+    def __init__(self):
+        self.scopes = []
+
+    def resolve(self, node):
+        method_name = f'resolve_{type(node).__name__}'
+        method = getattr(self, method_name, self.no_resolve_method)
+        method(node)
+        return node
+
+    def no_resolve_method(self, node):
+        exception_msg = f'No resolve_{type(node).__name__} method defined'
+        raise Exception(exception_msg)
+
+    def lookup(self, name):
+        if not self.scopes: return None
+        return self.scopes[-1].slots.get(name)
+
+    def declare_locals(self, node, scope):
+        '''Hoist the names declared in a function body (not in nested function bodies)'''
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if isinstance(node, VarAssignNode):
+                scope.declare(node.var_name_tok.value)
+                pending.append(node.value_node)
+            elif isinstance(node, ForNode):
+                scope.declare(node.var_name_tok.value)
+                pending.extend(n for n in (node.start_value_node, node.end_value_node,
+                                           node.step_value_node, node.body_node) if n)
+            elif isinstance(node, FuncDefNode):
+                if node.var_name_tok: scope.declare(node.var_name_tok.value)
+            elif isinstance(node, BinOpNode):
+                pending.extend((node.left_node, node.right_node))
+            elif isinstance(node, UnaryOpNode):
+                pending.append(node.node)
+            elif isinstance(node, IfNode):
+                for condition, expr in node.cases: pending.extend((condition, expr))
+                if node.else_case: pending.append(node.else_case)
+            elif isinstance(node, WhileNode):
+                pending.extend((node.condition_node, node.body_node))
+            elif isinstance(node, CallNode):
+                pending.append(node.node_to_call)
+                pending.extend(node.arg_nodes)
+
+    # Nodes
+    def resolve_NumberNode(self, node):
+        pass
+
+    def resolve_StringNode(self, node):
+        pass
+
+    def resolve_VarAccessNode(self, node):
+        node.address = self.lookup(node.var_name_tok.value)
+
+    def resolve_VarAssignNode(self, node):
+        self.resolve(node.value_node)
+        node.address = self.lookup(node.var_name_tok.value)
+
+    def resolve_BinOpNode(self, node):
+        self.resolve_operators(node)
+
+    def resolve_UnaryOpNode(self, node):
+        self.resolve_operators(node)
+
+    def resolve_operators(self, node):
+        '''Walks a tree of operators with an explicit stack, deep expressions don't recurse in python'''
+        pending = [node]
+        while pending:
+            node = pending.pop()
+            if type(node) is BinOpNode:
+                pending.append(node.right_node)
+                pending.append(node.left_node)
+            elif type(node) is UnaryOpNode:
+                pending.append(node.node)
+            else:
+                self.resolve(node)
+
+    def resolve_IfNode(self, node):
+        for condition, expr in node.cases:
+            self.resolve(condition)
+            self.resolve(expr)
+        if node.else_case: self.resolve(node.else_case)
+
+    def resolve_ForNode(self, node):
+        self.resolve(node.start_value_node)
+        self.resolve(node.end_value_node)
+        if node.step_value_node: self.resolve(node.step_value_node)
+        node.address = self.lookup(node.var_name_tok.value)
+        self.resolve(node.body_node)
+
+    def resolve_WhileNode(self, node):
+        self.resolve(node.condition_node)
+        self.resolve(node.body_node)
+
+    def resolve_FuncDefNode(self, node):
+        # The name belongs to the scope where the function is defined
+        node.address = self.lookup(node.var_name_tok.value) if node.var_name_tok else None
+
+        scope = Scope([arg_name.value for arg_name in node.arg_name_toks])
+        self.declare_locals(node.node_to_call, scope)
+        self.scopes.append(scope)
+        self.resolve(node.node_to_call)
+        self.scopes.pop()
+        node.frame_names = scope.slots
+
+    def resolve_CallNode(self, node):
+        self.resolve(node.node_to_call)
+        for arg_node in node.arg_nodes: self.resolve(arg_node)
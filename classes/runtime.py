@@ -1,18 +0,0 @@
-### RUNTIME RESULT ###
-
-class RuntimeResult:
-    def __init__(self):
-        self.value, self.error = None, None
-
-    def register(self, res):
-        if res.error: self.error = res.error
-        return res.value
-    
-    def success(self, value):
-        self.value = value
-        return self
-
-    def failure(self, error):
-        self.error = error
-        return self
-
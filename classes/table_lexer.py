@@ -0,0 +1,101 @@
+import re
+from constants import *
+from classes.token import Token
+from classes.error import *
+from classes.lexer import Source
+
+
+### TABLE LEXER ###
+# Same tokens and errors as classes/lexer.py, but scans whole runs with one
+# precompiled pattern and slices the token text out of the source instead of
+# walking it one character at a time. Tokens only get offsets, lines and
+# columns are left to the Source.
+
+TOKEN_RE = re.compile(r'''
+      (?P<space>[ \t]+)
+    | (?P<number>[0-9]+(?:\.[0-9]*)?)
+    | (?P<identifier>[A-Za-z][A-Za-z0-9_]*)
+    | (?P<quote>["'])
+    | (?P<op>->|==|!=|<=|>=|[-+*/^(),=<>])
+    | (?P<bang>!)
+    | (?P<illegal>[\s\S])
+''', re.VERBOSE)
+
+# Body of a string up to (not including) the closing quote
+STRING_BODY_RE = {
+    '"': re.compile(r'(?:[^"\\]|\\[\s\S])*'),
+    "'": re.compile(r"(?:[^'\\]|\\[\s\S])*"),
+}
+ESCAPE_RE    = re.compile(r'\\([\s\S])')
+ESCAPE_CHARS = {'n': '\n', 't': '\t'}
+
+OP_TYPES = {
+    '+':  TT_PLUS,   '-':  TT_MINUS,  '*':  TT_MUL,    '/':  TT_DIV,
+    '^':  TT_POW,    '(':  TT_LPAREN, ')':  TT_RPAREN, ',':  TT_COMMA,
+    '=':  TT_EQ,     '<':  TT_LT,     '>':  TT_GT,
+    '->': TT_ARROW,  '==': TT_EE,     '!=': TT_NE,     '<=': TT_LTE,  '>=': TT_GTE,
+}
+KEYWORD_SET = frozenset(KEYWORDS)
+
+
+class TableLexer:
+    def __init__(self, fn, text):
+        self.fn     = fn
+        self.text   = text
+        self.source = Source(fn, text)
+
+    def make_tokens(self):
+        try:
+            return self.tokenize(), None
+        except ErrorSignal as signal:
+            return [], signal.error
+
+    def tokenize(self):
+        '''Returns the list of tokens, errors are raised as ErrorSignal'''
+        return list(self.stream())
+
+    def stream(self):
+        '''
+        Yields the tokens one at a time, ending with EOF. Errors are raised
+        as ErrorSignal when the scan reaches them
+        '''
+        source, text = self.source, self.text
+        match = TOKEN_RE.match
+        idx, length = 0, len(text)
+
+        while idx < length:
+            m = match(text, idx)
+            kind = m.lastgroup
+            end  = m.end()
+
+            if kind == 'space':
+                idx = end
+                continue
+
+            if kind == 'op':
+                tok_type, value = OP_TYPES[m.group()], None
+            elif kind == 'identifier':
+                value = m.group()
+                tok_type = TT_KEYWORD if value in KEYWORD_SET else TT_IDENTIFIER
+            elif kind == 'number':
+                value = m.group()
+                if '.' in value: tok_type, value = TT_FLOAT, float(value)
+                else:            tok_type, value = TT_INT, int(value)
+            elif kind == 'quote':
+                tok_type, quote = TT_STRING, m.group()
+                end = STRING_BODY_RE[quote].match(text, end).end()
+                value = text[idx + 1:end]
+                if '\\' in value:
+                    value = ESCAPE_RE.sub(lambda esc: ESCAPE_CHARS.get(esc.group(1), esc.group(1)), value)
+                # Past the closing quote, or one past the end when there is none (like the Lexer)
+                end = end + 1 if end < length and text[end] == quote else length + 1
+            elif kind == 'bang':
+                raise ErrorSignal(ExpectedCharError(source, idx, idx + 2, "'=' (after '!')"))
+            else:
+                raise ErrorSignal(IllegalCharError(source, idx, end, f'"{m.group()}"'))
+
+            yield Token(tok_type, value, source, idx, end)
+            idx = end
+
+        # Indicar fim de arquivo
+        yield Token(TT_EOF, None, source, idx)
@@ -1,22 +1,21 @@
 
 
 class Token:
-    def __init__(self, type_, value=None, pos_start=None, pos_end=None) -> None:
-        self.type  = type_
-        self.value = value
+    '''pos_start and pos_end are offsets into source, pos_end defaults to one character'''
+    __slots__ = ('type', 'value', 'source', 'pos_start', 'pos_end')
 
-        if pos_start: 
-            self.pos_start = pos_start.copy()
-            self.pos_end   = pos_start.copy()
-            self.pos_end.advance()
+    def __init__(self, type_, value=None, source=None, pos_start=None, pos_end=None) -> None:
+        self.type   = type_
+        self.value  = value
+        self.source = source
 
-        if pos_end: self.pos_end = pos_end.copy()
+        self.pos_start = pos_start
+        self.pos_end   = pos_end
+        if pos_end is None and pos_start is not None: self.pos_end = pos_start + 1
 
     def matches(self, type_, value):
         return self.type == type_ and self.value == value
 
     def __repr__(self):
-        if self.value : return f'{self.type}:{self.value}'
+        if self.value is not None: return f'{self.type}:{self.value}'
         return f'{self.type}'
-
-
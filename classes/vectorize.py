@@ -0,0 +1,202 @@
+import operator
+
+from constants     import *
+from classes.node  import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+### LOOP VECTORIZATION ###
+# A FOR whose body is an arithmetic or comparison expression over the loop
+# variable and loop-invariant numbers (or VAR name = such an expression, when
+# it doesn't read name) only leaves behind what its last iteration assigns and
+# the first error it raises. scalar_start() evaluates the body with NumPy, a
+# fixed size chunk of the index range at a time, to find the first iteration
+# dividing by zero; the engines then run the normal scalar loop from the
+# iteration before it, or only the last iteration, so values and errors are
+# exactly the scalar ones. Bodies are checked before anything is allocated,
+# and running out of memory falls back to the scalar loop.
+#
+# Python ints don't overflow but int64 does: a loop is only vectorized if
+# every int its body can compute stays below 2 ** 53, where int64 and float64
+# arithmetic and mixed int/float comparisons are exact. POW needs an int base
+# and a small int exponent, AND/OR need ints. Anything else (strings, calls,
+# IFs, undefined names...) runs scalar, and so does everything without NumPy.
+
+MIN_LENGTH = 64      # Shorter loops aren't worth the NumPy setup
+CHUNK      = 1 << 16 # Indices evaluated at once, memory stays bounded on any range
+INT_LIMIT  = 2 ** 53
+MAX_POWER  = 64
+
+ARITH_OPS = {TT_PLUS: operator.add, TT_MINUS: operator.sub, TT_MUL: operator.mul}
+COMPARE_OPS = {
+    TT_EE: operator.eq, TT_NE: operator.ne,
+    TT_LT: operator.lt, TT_LTE: operator.le,
+    TT_GT: operator.gt, TT_GTE: operator.ge,
+}
+
+def scalar_start(for_node, indices, load, meter=None):
+    '''
+    Position in indices (the loop's range) the scalar loop has to start at.
+    load(var_node) gives the current value of a variable the body reads.
+    Metered runs pay for every iteration, they always run the whole loop
+    '''
+    if numpy is None or meter is not None or len(indices) < MIN_LENGTH: return 0
+
+    var_name = for_node.var_name_tok.value
+    body = for_node.body_node
+    target = None
+    if type(body) is VarAssignNode:
+        target = body.var_name_tok.value
+        if target == var_name: return 0
+        body = body.value_node
+
+    bound = max(abs(indices[0]), abs(indices[-1]))
+    if bound >= INT_LIMIT or not only_operators(body): return 0
+
+    vectorizer = LoopVectorizer(var_name, target, bound, load)
+    try:
+        # The first chunk with an error ends the search
+        for chunk_start in range(0, len(indices), CHUNK):
+            chunk = indices[chunk_start:chunk_start + CHUNK]
+            first_error = vectorizer.first_error(body, chunk)
+            if first_error is None: return 0
+            if first_error < len(chunk): return max(chunk_start + first_error - 1, 0)
+    except MemoryError:
+        return 0
+    return len(indices) - 1
+
+def only_operators(node):
+    '''True when node only has operators over numbers and names, checked before anything is allocated'''
+    pending = [node]
+    while pending:
+        node = pending.pop()
+        node_type = type(node)
+        if node_type is BinOpNode:     pending.extend((node.left_node, node.right_node))
+        elif node_type is UnaryOpNode: pending.append(node.node)
+        elif node_type is not NumberNode and node_type is not VarAccessNode: return False
+    return True
+
+
+class LoopVectorizer:
+    '''
+    Evaluates an expression for a chunk of indices at once. Operands are
+    (value, bound): value is an int64/float64 array or a python int/float
+    when it is the same for every index, bound the biggest absolute value an
+    int can take (None for floats). Bounds come from the whole range, so
+    every chunk makes the same decisions
+    '''
+    def __init__(self, var_name, target, bound, load):
+        self.var_name = var_name
+        self.target   = target # Assigned by the body, can't be read by it
+        self.load     = load
+        self.bound    = bound
+
+    def first_error(self, node, indices):
+        '''Position of the first iteration of indices raising, len(indices) if none does. None if not vectorizable'''
+        self.index    = (numpy.arange(indices.start, indices.stop, indices.step, dtype=numpy.int64), self.bound)
+        self.error_at = len(indices)
+        results = []
+        pending = [(node, False)] # (node, operands already evaluated)
+
+        with numpy.errstate(all='ignore'):
+            while pending:
+                node, ready = pending.pop()
+                node_type = type(node)
+
+                if ready:
+                    if node_type is BinOpNode:
+                        right = results.pop()
+                        result = self.binary(node.op_tok, results.pop(), right)
+                    else:
+                        result = self.unary(node.op_tok, results.pop())
+                elif node_type is BinOpNode:
+                    pending.append((node, True))
+                    pending.append((node.right_node, False))
+                    pending.append((node.left_node, False))
+                    continue
+                elif node_type is UnaryOpNode:
+                    pending.append((node, True))
+                    pending.append((node.node, False))
+                    continue
+                else:
+                    result = self.leaf(node)
+
+                if result is None: return None
+                results.append(result)
+
+        return int(self.error_at)
+
+    def leaf(self, node):
+        if type(node) is NumberNode:
+            value = node.tok.value
+        elif type(node) is VarAccessNode:
+            name = node.var_name_tok.value
+            if name == self.var_name: return self.index
+            if name == self.target: return None
+            # Only Numbers have an int or float value
+            value = getattr(self.load(node), 'value', None)
+        else:
+            return None
+
+        if type(value) is float: return value, None
+        if type(value) is int and abs(value) < INT_LIMIT: return value, abs(value)
+        return None
+
+    def binary(self, op_tok, left, right):
+        (left_value, left_bound), (right_value, right_bound) = left, right
+        op_type = op_tok.type
+        ints = left_bound is not None and right_bound is not None
+
+        if op_type in ARITH_OPS:
+            if not ints: return ARITH_OPS[op_type](left_value, right_value), None
+            bound = left_bound * right_bound if op_type == TT_MUL else left_bound + right_bound
+            if bound >= INT_LIMIT: return None
+            return ARITH_OPS[op_type](left_value, right_value), bound
+
+        if op_type == TT_DIV:
+            if type(right_value) is numpy.ndarray:
+                zeros = numpy.flatnonzero(right_value == 0)
+                if zeros.size: self.error_at = min(self.error_at, zeros[0])
+            elif right_value == 0:
+                # Every iteration raises, the value doesn't matter anymore
+                self.error_at = 0
+                return float('nan'), None
+            return left_value / right_value, None
+
+        if op_type in COMPARE_OPS:
+            result = COMPARE_OPS[op_type](left_value, right_value)
+            if type(result) is numpy.ndarray: return result.astype(numpy.int64), 1
+            return int(result), 1
+
+        if op_type == TT_POW:
+            # int ** small non negative int stays an exact int, the rest may not
+            if left_bound is None or type(right_value) is not int or not 0 <= right_value <= MAX_POWER: return None
+            bound = left_bound ** right_value
+            if bound >= INT_LIMIT: return None
+            return left_value ** right_value, bound
+
+        if op_tok.matches(TT_KEYWORD, 'AND') or op_tok.matches(TT_KEYWORD, 'OR'):
+            # int(a and b) of floats can raise, of ints it picks an operand
+            if not ints: return None
+            bound = max(left_bound, right_bound)
+            if type(left_value) is not numpy.ndarray and type(right_value) is not numpy.ndarray:
+                if op_tok.value == 'AND': return int(left_value and right_value), bound
+                return int(left_value or right_value), bound
+            if op_tok.value == 'AND': picked = numpy.where(left_value != 0, right_value, left_value)
+            else:                     picked = numpy.where(left_value != 0, left_value, right_value)
+            return picked.astype(numpy.int64), bound
+
+        return None
+
+    def unary(self, op_tok, operand):
+        value, bound = operand
+        if op_tok.type == TT_MINUS: return -value, bound
+        if op_tok.matches(TT_KEYWORD, 'NOT'):
+            result = value == 0
+            if type(result) is numpy.ndarray: return result.astype(numpy.int64), 1
+            return int(result), 1
+        return operand
@@ -0,0 +1,271 @@
+import asyncio
+
+from classes.error import *
+from classes.interpreter import Number, Function, BuiltInFunction, pure_memo, call_memo_key
+from classes.vectorize import scalar_start
+from classes.meter import context_meter
+from classes.bytecode import *
+
+
+### VM FUNCTION ###
+
+class VMFunction(Function):
+    __slots__ = ('code',)
+
+    def __init__(self, name, body_node, arg_names, code, memo=None, calls=None):
+        super().__init__(name, body_node, arg_names, memo, calls)
+        self.code = code
+
+    def execute(self, args, context, node):
+        '''Used when the function is called from outside of a VM (e.g. by the Interpreter)'''
+        memo = self.memo
+        key = None
+        if memo is not None:
+            key = call_memo_key(self, args, context.symbol_table.get)
+            value = memo.get(key) if key is not None else None
+            if value is not None: return value
+
+        exec_context = self.generate_new_context(context, node)
+        self.check_and_populate_args(self.arg_names, args, exec_context, node)
+        value = VM().run(self.code, exec_context)
+
+        if key is not None and value is not None: memo.put(key, value)
+        return value
+
+
+### VIRTUAL MACHINE ###
+
+# Builtins waiting on the outside world, awaited instead of called by run_async()
+AWAITED_BUILTINS = (BuiltInFunction.input, BuiltInFunction.input_int)
+
+
+class VM:
+    def __init__(self, slice_size=0):
+        # Loop iterations and calls between two yields of steps(), 0 = never yield
+        self.slice_size = slice_size
+        self.meter = None
+        self.period = 0 # Ticks between the last two checkpoints
+        self.since_yield = 0
+
+    def run(self, code_obj, context):
+        '''Execute code_obj to the end, the value comes back with the StopIteration of steps()'''
+        try:
+            next(self.steps(code_obj, context))
+        except StopIteration as stop:
+            return stop.value
+        raise Exception('steps() yielded without a slice size')
+
+    async def run_async(self, code_obj, context):
+        '''
+        Execute code_obj, giving control back to the event loop every
+        slice_size loop iterations and calls, and awaiting the input builtins
+        '''
+        steps = self.steps(code_obj, context)
+        sent = None
+        try:
+            while True:
+                request = steps.send(sent)
+                sent = None
+                if request is None: await asyncio.sleep(0)
+                else:               sent = await request
+        except StopIteration as stop:
+            return stop.value
+
+    def steps(self, code_obj, context):
+        '''
+        Execute code_obj in a single dispatch loop. Calls to VMFunctions push a
+        frame instead of recursing in python, so the call depth is only
+        limited by memory, and tail calls don't push one at all. Runtime
+        errors are raised as ErrorSignal.
+        Loop back edges (LOOP) and calls count down ticks. Without a slice
+        size or a meter it never reaches 0, otherwise checkpoint() charges
+        the meter and, every slice_size ticks, yields None to run_async().
+        Calls to the input builtins yield the awaitable reading the line
+        instead, whose value is sent back.
+        '''
+        slice_size = self.slice_size
+        self.meter = context_meter(context)
+        ticks = self.next_period() if slice_size or self.meter else -1
+        frames = []
+        code, consts, names, positions = code_obj.code, code_obj.consts, code_obj.names, code_obj.positions
+        symbols = context.symbol_table
+        stack = []
+        pc = 0
+
+        while True:
+            op  = code[pc]
+            arg = code[pc + 1]
+            pc += 2
+
+            if op == LOAD_NAME:
+                value = symbols.get(names[arg])
+                if not value:
+                    node = positions[(pc - 2) >> 1]
+                    raise ErrorSignal(RuntimeError(
+                        node.source, node.pos_start, node.pos_end,
+                        f"'{names[arg]}' is not defined",
+                        context
+                    ))
+                stack.append(value)
+
+            elif op == LOAD_CONST:
+                stack.append(consts[arg])
+
+            elif op == BINARY_OP:
+                right = stack.pop()
+                left  = stack.pop()
+                fast  = BINARY_FAST[arg]
+                if fast and type(left) is Number and type(right) is Number:
+                    stack.append(fast(left.value, right.value))
+                    continue
+                result, error = BINARY_FUNCS[arg](left, right)
+                if error: raise ErrorSignal(error.locate(positions[(pc - 2) >> 1], context))
+                stack.append(result)
+
+            elif op == POP_JUMP_IF_FALSE:
+                if not stack.pop().is_true(): pc = arg
+
+            elif op == JUMP:
+                pc = arg
+
+            elif op == LOOP:
+                ticks -= 1
+                if not ticks: ticks = yield from self.checkpoint(positions[(pc - 2) >> 1], context)
+                pc = arg
+
+            elif op == STORE_NAME:
+                symbols.set(names[arg], stack[-1])
+
+            elif op == POP_TOP:
+                stack.pop()
+
+            elif op == FOR_ITER:
+                i = next(stack[-1], None)
+                if i is None:
+                    stack.pop()
+                    pc = arg
+                else:
+                    stack.append(Number.of(i))
+
+            elif op == CALL:
+                node = positions[(pc - 2) >> 1]
+                if arg:
+                    args = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    args = []
+                callee = stack.pop()
+
+                ticks -= 1
+                if not ticks: ticks = yield from self.checkpoint(node, context)
+
+                if type(callee) is VMFunction:
+                    # Memoized results are stored by RETURN, with the key kept in the frame
+                    memo = callee.memo
+                    key = None
+                    if memo is not None:
+                        key = call_memo_key(callee, args, symbols.get)
+                        value = memo.get(key) if key is not None else None
+                        if value is not None:
+                            stack.append(value)
+                            continue
+
+                    exec_context = callee.generate_new_context(context, node)
+                    callee.check_and_populate_args(callee.arg_names, args, exec_context, node)
+
+                    frames.append((code_obj, pc, stack, context, memo, key))
+                    code_obj = callee.code
+                    code, consts, names, positions = code_obj.code, code_obj.consts, code_obj.names, code_obj.positions
+                    context = exec_context
+                    symbols = context.symbol_table
+                    stack = []
+                    pc = 0
+                elif slice_size and callee in AWAITED_BUILTINS:
+                    stack.append((yield callee.execute_async(args, context, node)))
+                else:
+                    stack.append(callee.execute(args, context, node))
+
+            elif op == TAIL_CALL:
+                node = positions[(pc - 2) >> 1]
+                if arg:
+                    args = stack[-arg:]
+                    del stack[-arg:]
+                else:
+                    args = []
+                callee = stack.pop()
+
+                ticks -= 1
+                if not ticks: ticks = yield from self.checkpoint(node, context)
+
+                if type(callee) is VMFunction:
+                    # Only emitted in function bodies: the callee takes over this
+                    # call's context and returns straight to its caller
+                    callee.reenter(args, context, node)
+                    code_obj = callee.code
+                    code, consts, names, positions = code_obj.code, code_obj.consts, code_obj.names, code_obj.positions
+                    stack = []
+                    pc = 0
+                elif slice_size and callee in AWAITED_BUILTINS:
+                    stack.append((yield callee.execute_async(args, context, node)))
+                else:
+                    stack.append(callee.execute(args, context, node))
+
+            elif op == RETURN:
+                value = stack.pop()
+                if not frames: return value
+
+                code_obj, pc, stack, context, memo, key = frames.pop()
+                if key is not None and value is not None: memo.put(key, value)
+                code, consts, names, positions = code_obj.code, code_obj.consts, code_obj.names, code_obj.positions
+                symbols = context.symbol_table
+                stack.append(value)
+
+            elif op == LOAD_NONE:
+                stack.append(None)
+
+            elif op == UNARY_NEG:
+                number, error = stack.pop().multiplied_by(Number.minus_one)
+                if error: raise ErrorSignal(error.locate(positions[(pc - 2) >> 1].node, context))
+                stack.append(number)
+
+            elif op == UNARY_NOT:
+                number, error = stack.pop().notted()
+                if error: raise ErrorSignal(error.locate(positions[(pc - 2) >> 1].node, context))
+                stack.append(number)
+
+            elif op == UNARY_POS:
+                pass
+
+            elif op == FOR_PREP:
+                step_value  = stack.pop()
+                end_value   = stack.pop()
+                start_value = stack.pop()
+                indices = range(start_value.value, end_value.value, step_value.value)
+                load = lambda var_node: symbols.get(var_node.var_name_tok.value)
+                start = scalar_start(positions[(pc - 2) >> 1], indices, load, self.meter)
+                stack.append(iter(indices[start:]))
+
+            elif op == MAKE_FUNCTION:
+                template = consts[arg]
+                memo = pure_memo(template.calls, context)
+                stack.append(VMFunction(template.name, template.body_node, template.arg_names, template.code, memo, template.calls))
+
+            else:
+                raise Exception(f'Unknown opcode {op}')
+
+    def checkpoint(self, node, context):
+        '''Reached when steps() counted down a period at node, gives the next one'''
+        if self.meter is not None: self.meter.advance(self.period, node, context)
+        if self.slice_size:
+            self.since_yield += self.period
+            if self.since_yield == self.slice_size:
+                self.since_yield = 0
+                yield None
+        return self.next_period()
+
+    def next_period(self):
+        '''Ticks until the next yield or until the meter has to be charged'''
+        period = self.meter.until_check() if self.meter is not None else self.slice_size
+        if self.slice_size: period = min(period, self.slice_size - self.since_yield)
+        self.period = period
+        return period
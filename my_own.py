@@ -2,37 +2,204 @@
 # And also:  https://ruslanspivak.com/lsbasi-part1/
 # Extremely helpfull to build the compiler
 
-from utils import Context, SymbolTable
+import os
+
+from utils import Context, SymbolTable, FrozenSymbolTable, RunOptions
+from classes.error import ErrorSignal
 from classes.lexer  import Lexer
+from classes.table_lexer import TableLexer
 from classes.parser import Parser
 from classes.interpreter import Interpreter, Number, BuiltInFunction
+from classes import compiler
+from classes.resolver import Resolver
+from classes.optimizer import Optimizer
+from classes.cache import ProgramCache, CachedProgram
+from classes.disk_cache import DiskCache
+from classes.bytecode import BytecodeCompiler
+from classes.vm import VM
+from classes.meter import Meter
+from classes.profiler import ProfilingInterpreter
 
 ### RUN ###
 
-global_symbol_table = SymbolTable()
-global_symbol_table.set("null",  Number.null)
-global_symbol_table.set("True",  Number.true)
-global_symbol_table.set("False", Number.false)
-global_symbol_table.set("print",     BuiltInFunction.print)
-global_symbol_table.set("print_ret", BuiltInFunction.print_ret)
-global_symbol_table.set("input",     BuiltInFunction.input)
-global_symbol_table.set("input_int", BuiltInFunction.input_int)
+# The builtins, read only. Every run's globals are an overlay on top of them
+builtin_symbol_table = FrozenSymbolTable({
+    "null":  Number.null,
+    "True":  Number.true,
+    "False": Number.false,
+    "print":     BuiltInFunction.print,
+    "print_ret": BuiltInFunction.print_ret,
+    "input":     BuiltInFunction.input,
+    "input_int": BuiltInFunction.input_int,
+    "array":       BuiltInFunction.array,
+    "array_range": BuiltInFunction.array_range,
+    "len":         BuiltInFunction.len,
+    "get":         BuiltInFunction.get,
+    "slice":       BuiltInFunction.slice,
+    "parallel_map": BuiltInFunction.parallel_map,
+})
+
+def new_globals():
+    '''
+    Empty global scope over the builtins, in O(1): VARs land in it and can
+    shadow a builtin, the builtins themselves are shared and never change
+    '''
+    return SymbolTable(builtin_symbol_table)
+
+ENGINES = ('tree', 'closure', 'vm')
+
+# Parsed programs, reused when the same source is run again. Resize with program_cache.set_capacity()
+program_cache = ProgramCache()
+
+# Parsed programs kept on disk between processes, off unless a directory is
+# given through enable_disk_cache() or the MY_OWN_CACHE_DIR environment variable
+disk_cache = None
+
+def enable_disk_cache(directory, max_bytes=64 * 1024 * 1024):
+    global disk_cache
+    disk_cache = DiskCache(directory, max_bytes)
+    return disk_cache
+
+def disable_disk_cache():
+    global disk_cache
+    disk_cache = None
+
+if os.environ.get('MY_OWN_CACHE_DIR'):
+    enable_disk_cache(os.environ['MY_OWN_CACHE_DIR'])
+
+def run(fn, text, engine='tree', optimize=0, report=None, use_cache=True, stream=False, memoize=0, workers=None,
+        fuel=None, timeout=None, symbol_table=None, profile=None):
+    '''
+    engine:
+        tree    -> the reference Interpreter, visits the AST node by node
+        closure -> resolves variables to frame slots and compiles the AST
+                   into python closures before running it
+        vm      -> compiles the AST into bytecode and runs it on the stack VM
+    optimize: level of the constant folding pass (0 = off), see classes/optimizer.py
+    report:   optional list, gets one line per simplification the optimizer made
+    use_cache: reuse the tokens and AST of a previous run of the same source,
+               from memory or from the disk cache when it is enabled
+    stream:   feed the parser straight from the lexer instead of building the
+              token list first (see load_program)
+    memoize:  cache the results of pure functions, up to this many per
+              function (0 = off), see MEMOIZATION in classes/interpreter.py
+    workers:  processes used by parallel_map (None = one per cpu, 1 = no pool)
+    fuel:     loop iterations and calls the program may make (None = no limit)
+    timeout:  seconds the program may run (None = no limit). Going over
+              either is a LimitExceededError, see classes/meter.py
+    symbol_table: globals of the program. By default each run gets its own
+                  new_globals(), dropped afterwards, so runs (in threads or
+                  one after the other) never see each other's VARs. Pass the
+                  same table to several runs to share them, like a REPL
+    profile:  a Profiler (classes/profiler.py) to fill with call, time and node
+              statistics of the run. Only on the tree engine
+    '''
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
+    if profile is not None and engine != 'tree':
+        raise ValueError(f"Profiling runs on the tree engine, not '{engine}'")
+
+    # Errors from every stage are raised as ErrorSignal and caught here, once
+    try:
+        program = cached_program(fn, text, optimize, use_cache, stream)
+        if report is not None: report.extend(program.folded)
+
+        # Run program 
+        context = Context('<program>')
+        context.symbol_table = symbol_table if symbol_table is not None else new_globals()
+        if profile is not None:
+            # The profiler is ticked like a meter, and keeps the limits
+            profile.limit(fuel, timeout)
+            context.options = RunOptions(memoize, workers, meter=profile)
+            return ProfilingInterpreter(profile).run(program.ast, context), None
 
-def run(fn, text):
+        context.options = RunOptions(memoize, workers, meter=new_meter(fuel, timeout))
+        return execute(program.ast, context, engine), None
+    except ErrorSignal as signal:
+        return None, signal.error
+
+async def run_async(fn, text, optimize=0, report=None, use_cache=True, memoize=0, workers=None,
+                    fuel=None, timeout=None, symbol_table=None, slice_size=1000, read_line=None):
+    '''
+    run() for asyncio programs, on the vm engine. The VM gives control back
+    to the event loop every slice_size loop iterations and calls, so one long
+    script doesn't hold up the others.
+    read_line: coroutine function giving a line to input and input_int,
+               stdin is read in a thread when it's None
+    '''
+    try:
+        program = cached_program(fn, text, optimize, use_cache)
+        if report is not None: report.extend(program.folded)
+
+        context = Context('<program>')
+        context.symbol_table = symbol_table if symbol_table is not None else new_globals()
+        context.options = RunOptions(memoize, workers, read_line, new_meter(fuel, timeout))
+        code = BytecodeCompiler().compile_program(program.ast)
+        return await VM(slice_size).run_async(code, context), None
+    except ErrorSignal as signal:
+        return None, signal.error
+
+def new_meter(fuel, timeout):
+    # Without limits the engines skip metering altogether
+    if fuel is None and timeout is None: return None
+    return Meter(fuel, timeout)
+
+def cached_program(fn, text, optimize=0, use_cache=True, stream=False):
+    '''load_program() going through the memory and disk caches'''
+    key = (fn, text, optimize)
+    program = program_cache.get(key) if use_cache else None
+    if program is None and use_cache and disk_cache:
+        program = disk_cache.load(fn, text, optimize)
+        if program is not None: program_cache.put(key, program)
+    if program is None:
+        program = load_program(fn, text, optimize, stream=stream)
+        if use_cache:
+            program_cache.put(key, program)
+            # Tokens are not needed to run, keep the entries small
+            if disk_cache: disk_cache.store(fn, text, optimize, CachedProgram(None, program.ast, program.folded))
+    return program
+
+def run_file(path, **kwargs):
+    '''Run a script file, same keyword arguments as run()'''
+    # Programs are one line, the lexer rejects the newline editors end files with
+    with open(path, encoding='utf-8') as file:
+        text = file.read().rstrip()
+    return run(path, text, **kwargs)
+
+# Both give the same tokens and errors, Lexer is the reference one
+LEXERS = {'table': TableLexer, 'char': Lexer}
+
+def load_program(fn, text, optimize=0, lexer='table', stream=False):
+    '''
+    Lex, parse and optimize. Errors are raised as ErrorSignal.
+    With stream the parser pulls tokens from the lexer as it goes: the token
+    list is never built (the program comes back without tokens) and a syntax
+    error stops the scan, so it is reported even if an illegal character
+    comes later in the source
+    '''
     # Generate Tokens
-    lexer = Lexer(fn, text)
-    tokens, error = lexer.make_tokens()
-    if error: return None, error
-    
+    lexer  = LEXERS[lexer](fn, text)
+    tokens = lexer.stream() if stream else lexer.tokenize()
+
     #Generate AST (Abstract Syntax Three)
     parser = Parser(tokens)
-    ast    = parser.parse()
-    if ast.error: return None, ast.error
+    ast    = parser.parse_program()
+
+    folded = []
+    if optimize:
+        optimizer = Optimizer(optimize)
+        ast = optimizer.optimize(ast)
+        folded = optimizer.folded
+
+    return CachedProgram(None if stream else tokens, ast, folded)
+
+def execute(ast, context, engine):
+    if engine == 'closure':
+        program = compiler.Compiler().compile(Resolver().resolve(ast))
+        return program(context)
 
-    # Run program 
-    interpreter = Interpreter()
-    context = Context('<program>')
-    context.symbol_table = global_symbol_table
-    res = interpreter.visit(ast.node, context)
+    if engine == 'vm':
+        code = BytecodeCompiler().compile_program(ast)
+        return VM().run(code, context)
 
-    return res.value, res.error
+    return Interpreter().visit(ast, context)
@@ -1,5 +1,7 @@
 import my_own
 
+# Globals stay from one line to the next
+symbol_table = my_own.new_globals()
 
 while True:
     text = input('OWN> ')
@@ -8,7 +10,7 @@ while True:
         exit()
 
     #print(text)
-    res, error = my_own.run('<stdin>', text)
+    res, error = my_own.run('<stdin>', text, symbol_table=symbol_table)
 
     if error: print(error.as_string())
     elif res: print(res)
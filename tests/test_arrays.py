@@ -0,0 +1,56 @@
+'''
+Packed arrays and their builtins, on every engine. From the repository root:
+
+    python -m unittest discover tests
+'''
+import unittest
+
+import my_own
+
+
+# (program, value repr or error details)
+VALUES = [
+    ('array(3, 2)', '[2, 2, 2]'), ('array(2, 1.5)', '[1.5, 1.5]'), ('array_range(2, 6)', '[2, 3, 4, 5]'),
+    ('len(array_range(0, 5))', '5'), ('len("abc")', '3'), ('get(array_range(0, 5), 2)', '2'),
+    ('slice(array_range(0, 10), 2, 5)', '[2, 3, 4]'), ('slice(array_range(0, 3), 3, 3)', '[]'),
+    ('array_range(0, 4) * 2 + 1', '[1, 3, 5, 7]'), ('1 / array_range(1, 3)', '[1.0, 0.5]'),
+    ('array_range(0, 4) == 2', '[0, 0, 1, 0]'), ('array_range(0, 3) + array(3, 0.5)', '[0.5, 1.5, 2.5]'),
+    ('array_range(0, 3) ^ 2', '[0, 1, 4]'), ('-array_range(0, 3)', '[0, -1, -2]'), ('NOT array_range(0, 2)', '[1, 0]'),
+]
+
+ERRORS = [
+    ('get(array_range(0, 5), 5)', "'get': index out of range"), ('get(1, 0)', "'get': wrong type for 'array'"),
+    ('slice(array_range(0, 10), 5, 2)', "'slice': slice out of range"),
+    ('array(-1, 0)', "'array': length must not be negative"), ('array(2, "s")', "'array': wrong type for 'value'"),
+    ('array_range(0, 3) + array_range(0, 4)', 'Arrays have different lengths'),
+    ('array(2, 9223372036854775807) + 1', 'Array element out of range'),
+    ('1 / array_range(0, 2)', 'Division by zero'), ('array_range(0, 3) + "s"', 'Illegal operation'),
+]
+
+
+class ArrayTest(unittest.TestCase):
+    def test_values(self):
+        for text, expected in VALUES:
+            for engine in my_own.ENGINES:
+                with self.subTest(text=text, engine=engine):
+                    value, error = my_own.run('<test>', text, engine)
+                    self.assertIsNone(error)
+                    self.assertEqual(repr(value), expected)
+
+    def test_errors(self):
+        for text, details in ERRORS:
+            for engine in my_own.ENGINES:
+                with self.subTest(text=text, engine=engine):
+                    value, error = my_own.run('<test>', text, engine)
+                    self.assertIsNone(value)
+                    self.assertEqual(error.details, details)
+
+    def test_elements_stay_packed(self):
+        value, _ = my_own.run('<test>', 'array_range(0, 4) * 2')
+        self.assertEqual(value.values.typecode, 'q')
+        value, _ = my_own.run('<test>', 'array_range(0, 4) * 0.5')
+        self.assertEqual(value.values.typecode, 'd')
+
+
+if __name__ == '__main__':
+    unittest.main()
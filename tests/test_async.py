@@ -0,0 +1,75 @@
+'''
+run_async(): scripts sharing an asyncio event loop. From the repository root:
+
+    python -m unittest discover tests
+'''
+import asyncio
+import contextlib
+import io
+import unittest
+
+import my_own
+
+
+def lines(*texts):
+    '''A read_line coroutine function giving texts one after the other'''
+    pending = list(texts)
+    async def read_line(): return pending.pop(0)
+    return read_line
+
+
+class RunAsyncTest(unittest.TestCase):
+    def test_same_results_as_run(self):
+        for text in ('FUN fact(n) -> IF n <= 1 THEN 1 ELSE n * fact(n - 1)', 'FOR i = 0 TO 5000 THEN VAR y = i', '1 / 0'):
+            with self.subTest(text=text):
+                value, error = asyncio.run(my_own.run_async('<test>', text))
+                expected_value, expected_error = my_own.run('<test>', text, 'vm')
+                self.assertEqual(repr(value), repr(expected_value))
+                self.assertEqual(error and error.as_string(), expected_error and expected_error.as_string())
+
+    def test_long_scripts_interleave(self):
+        order = []
+        async def script():
+            outcome = await my_own.run_async('<test>', 'WHILE 1 THEN 0', fuel=5000, slice_size=1000)
+            order.append('script')
+            return outcome
+
+        async def other():
+            for _ in range(3):
+                order.append('other')
+                await asyncio.sleep(0)
+
+        async def main():
+            return await asyncio.gather(script(), other())
+
+        (value, error), _ = asyncio.run(main())
+        self.assertEqual(error.error_name, 'Limit Exceeded')
+        self.assertEqual(order, ['other'] * 3 + ['script']) # Ran between the script's slices
+
+    def test_short_scripts_finish_first(self):
+        finished = []
+        async def script(n):
+            await my_own.run_async('<test>', f'FOR i = 0 TO {n} THEN len("s")', slice_size=100)
+            finished.append(n)
+
+        async def main():
+            await asyncio.gather(*(script(n) for n in (3000, 10, 1000)))
+        asyncio.run(main())
+        self.assertEqual(finished, [10, 1000, 3000])
+
+    def test_input_reads_lines(self):
+        value, error = asyncio.run(my_own.run_async('<test>', 'input() + "!"', read_line=lines('hi')))
+        self.assertEqual(repr(value), '"hi!"')
+
+        # input_int asks again until the line is a number
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            value, error = asyncio.run(my_own.run_async('<test>', 'input_int() * 2', read_line=lines('x', '', '21')))
+        self.assertEqual(repr(value), '42')
+        self.assertEqual(output.getvalue().count('must be an integer'), 2)
+
+        value, error = asyncio.run(my_own.run_async('<test>', 'input_int(1)', read_line=lines('1')))
+        self.assertEqual(error.details, "'input_int' expected 0 args, but received 1")
+
+
+if __name__ == '__main__':
+    unittest.main()
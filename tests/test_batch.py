@@ -0,0 +1,71 @@
+'''
+The batch runner (batch.py). From the repository root:
+
+    python -m unittest discover tests
+'''
+import contextlib
+import io
+import json
+import os
+import tempfile
+import unittest
+
+import batch
+
+
+SCRIPTS = {
+    'a.myown': 'VAR shared = 2 * 21\n',
+    'b.myown': 'shared\n',
+    'c.myown': 'print("out")\n',
+    'd.myown': '1 / 0\n',
+}
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        for name, text in SCRIPTS.items():
+            with open(self.path(name), 'w') as file: file.write(text)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def test_collects_directories_and_manifests(self):
+        self.assertEqual(batch.collect_scripts(self.directory.name, '*.myown'), [self.path(name) for name in sorted(SCRIPTS)])
+
+        with open(self.path('scripts.txt'), 'w') as file:
+            file.write('# comment\nb.myown\n\n  a.myown\n')
+        self.assertEqual(batch.collect_scripts(self.path('scripts.txt')), [self.path('b.myown'), self.path('a.myown')])
+
+    def test_reports_every_script_in_order(self):
+        paths = batch.collect_scripts(self.directory.name)
+        for workers in (1, 2):
+            with self.subTest(workers=workers):
+                report = batch.run_batch(paths, workers)
+                scripts = report['scripts']
+                self.assertEqual([script['path'] for script in scripts], paths)
+                self.assertEqual((report['passed'], report['failed']), (2, 2))
+
+                self.assertEqual(scripts[0]['result'], '42')
+                self.assertIn("'shared' is not defined", scripts[1]['error']) # Globals don't leak
+                self.assertEqual(scripts[2]['output'], 'out\n')
+                self.assertIn('Division by zero', scripts[3]['error'])
+
+    def test_python_errors_are_reported(self):
+        script = batch.run_script(self.path('missing.myown'))
+        self.assertTrue(script['error'].startswith('FileNotFoundError'))
+
+    def test_json_report_and_exit_status(self):
+        with contextlib.redirect_stdout(io.StringIO()) as output:
+            status = batch.main([self.directory.name, '--workers', '1', '--engine', 'vm', '--json', self.path('report.json')])
+        self.assertEqual(status, 1)
+        self.assertIn('2 passed, 2 failed, 4 scripts', output.getvalue())
+        with open(self.path('report.json')) as file:
+            self.assertEqual(len(json.load(file)['scripts']), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+'''
+The program caches: the in-memory LRU of run() and the disk cache. From the
+repository root:
+
+    python -m unittest discover tests
+'''
+import os
+import tempfile
+import unittest
+
+import my_own
+from classes import disk_cache
+from classes.cache import ProgramCache
+
+
+### LRU ###
+
+class ProgramCacheTest(unittest.TestCase):
+    def test_counters_and_eviction_order(self):
+        cache = ProgramCache(2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1) # 'b' is now the least recently used
+        cache.put('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.stats(), {'size': 2, 'capacity': 2, 'hits': 1, 'misses': 1, 'evictions': 1})
+
+    def test_resize(self):
+        cache = ProgramCache(3)
+        for key in 'abc': cache.put(key, key)
+        cache.set_capacity(1)
+        self.assertEqual(list(cache.entries), ['c'])
+        self.assertEqual(cache.evictions, 2)
+
+        cache.set_capacity(0)
+        cache.put('d', 'd')
+        self.assertEqual(len(cache), 0)
+
+    def test_run_reuses_parsed_programs(self):
+        my_own.program_cache.clear()
+        for _ in range(3): my_own.run('<test>', '1 + 2')
+        stats = my_own.program_cache.stats()
+        self.assertEqual((stats['misses'], stats['hits']), (1, 2))
+
+        my_own.run('<test>', '1 + 2', optimize=1) # Another level is another entry
+        self.assertEqual(my_own.program_cache.stats()['misses'], 2)
+        self.assertEqual(repr(my_own.run('<test>', '1 + 2', use_cache=False)), '(3, None)')
+        self.assertEqual(my_own.program_cache.stats()['misses'], 2)
+
+
+
+### DISK ###
+
+class DiskCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = my_own.enable_disk_cache(self.directory.name)
+        my_own.program_cache.clear()
+
+    def tearDown(self):
+        my_own.disable_disk_cache()
+        my_own.program_cache.clear()
+        self.directory.cleanup()
+
+    def entries(self):
+        return [name for name in os.listdir(self.directory.name) if name.endswith(disk_cache.SUFFIX)]
+
+    def cold_run(self, text):
+        '''A run from a new process: only the disk cache knows the program'''
+        my_own.program_cache.clear()
+        return repr(my_own.run('<test>', text))
+
+    def test_hits_after_a_cold_start(self):
+        self.assertEqual(self.cold_run('VAR a = 2 * 3'), '(6, None)')
+        self.assertEqual(self.cold_run('VAR a = 2 * 3'), '(6, None)')
+        self.assertEqual((self.cache.misses, self.cache.hits), (1, 1))
+        self.assertEqual(len(self.entries()), 1)
+
+    def test_corrupt_and_truncated_entries_are_dropped(self):
+        for damage in (b'not a pickle', None):
+            with self.subTest(damage=damage):
+                self.cold_run('1 + 2')
+                path = self.cache.path_for('<test>', '1 + 2', 0)
+                with open(path, 'rb') as file: data = file.read()
+                with open(path, 'wb') as file: file.write(damage or data[:len(data) // 2])
+
+                misses = self.cache.misses
+                self.assertEqual(self.cold_run('1 + 2'), '(3, None)')
+                self.assertEqual(self.cache.misses, misses + 1)
+                self.assertEqual(len(self.entries()), 1) # Dropped then written again
+                os.remove(path)
+
+    def test_eviction_keeps_max_bytes(self):
+        self.cold_run('1')
+        size = os.path.getsize(os.path.join(self.directory.name, self.entries()[0]))
+        self.cache.max_bytes = size * 3
+
+        for n in range(2, 10):
+            self.cold_run(str(n))
+        total = sum(os.path.getsize(os.path.join(self.directory.name, name)) for name in self.entries())
+        self.assertLessEqual(total, self.cache.max_bytes)
+        self.assertGreater(self.cache.evictions, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
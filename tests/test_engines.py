@@ -0,0 +1,230 @@
+'''
+Differential tests: every program of CORPUS must give the same values,
+errors and output on every engine, lexer and optimization level as the
+tree engine with the table lexer. Then regression tests for bugs the
+differential runs don't reach. From the repository root:
+
+    python -m unittest discover tests
+'''
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import my_own
+import utils
+from utils import Context, RunOptions
+from classes import vectorize
+from classes.error import ErrorSignal
+from classes.meter import Meter
+from classes.node import ForNode
+from classes.profiler import Profiler
+
+
+### CORPUS ###
+# Programs are lists of lines run one after the other on the same globals
+
+CORPUS = [
+    # Values and operators
+    ['VAR a = 1 + 2 * 3', 'a'], ['1 + 2 + 3 + 4 - 5 * 6 / 7 ^ 2'], ['(1 + 2) * (3 - 4)'], ['--1'], ['+-+1'],
+    ['2 ^ 10'], ['2 ^ 0.5'], ['10 / 4'], ['1.5 * 2'], ['"s" * 3'], ['"a" == "a"'], ['3 <= 4'], ['3 >= 4'],
+    ['1 == 1 AND 2 != 3 OR 0'], ['NOT NOT 0'], ['1 < 2 < 3'], ['True + False'], ['null'], ['   \t 7'],
+    ['"esc \\"q\\" \\n \\t \\\\"'], ['"a" + "b" + 1'], ['1 AND 2 OR 0 AND "x"'], ['"a" * 2 * 3'],
+
+    # Runtime errors
+    ['1 / 0'], ['y'], ['"a" - 1'], ['NOT "a"'], ['-"a"'], ['1 + "s"'], ['- - "a"'], ['NOT - "a"'],
+    ['- NOT FUN () -> 1'], ['1 - 2 - "x" - 3'], ['1 + 2 * "s" + 3'], ['(1 + 2) + (3 + "s")'], ['1 / 0 + 2 + 3'],
+    ['2 + 3 + 4 / 0'], ['1 AND "x"'], ['IF 0 THEN "a" * 1.5 ELSE 1'],
+
+    # Syntax errors
+    ['1 +'], ['(1'], ['1 $ 2'], ['VAR 1'], ['x(1,2'], ['1 + )'], ['1 ! 2'], ['"abc\n def" + 1'], ['"unterminated'],
+    ['FUN'], ['FUN f'], ['FUN f('], ['FUN f(a,'], ['FUN f(a) 1'], ['FOR'], ['FOR i'], ['FOR i = 1'], ['FOR i = 1 TO'],
+    ['WHILE 1'], ['IF 1'], ['IF 1 THEN 2 ELIF 3'], ['VAR'], ['VAR a'], ['NOT'], ['1 2'], [')'], [''], ['a(1)(2)'],
+
+    # Control flow
+    ['FOR i = 0 TO 10 THEN VAR s = i', 's'], ['VAR k = 0', 'WHILE k < 5 THEN VAR k = k + 1', 'k'],
+    ['IF 1 THEN "x" ELIF 2 THEN 3 ELSE 4'], ['IF 0 THEN 1'], ['FOR i = 10 TO 0 STEP -3 THEN print(i)'],
+    ['FOR i = 0 TO 300 THEN VAR y = i * i - 3 * i', 'y'], ['FOR i = 0 TO 300 THEN VAR y = 1 / (i - 250)', 'y'],
+
+    # Functions
+    ['FUN f(x) -> x / 0', 'f(1)', 'FUN g(a) -> f(a)', 'g(2)', 'f()', 'f(1, 2)'],
+    ['FUN fact(n) -> IF n <= 1 THEN 1 ELSE n * fact(n - 1)', 'fact(20)', 'fact(10.0)'],
+    ['FUN (x, y) -> x + y'], ['(FUN (x, y) -> x + y)(2, 3)'], ['print_ret(12)'], ['print_ret(1, 2)'],
+    ['FUN h() -> nope', 'h()'], ['VAR z = FUN (q) -> q + "1"', 'z(3)'],
+    ['FUN loop(n) -> IF n == 0 THEN 0 ELSE loop(n - 1)', 'loop(5000)'],
+
+    # Names a function sets are read from outside until the assignment ran
+    ['VAR y = 5', 'FUN f() -> IF y == 5 THEN VAR y = 2 ELSE 0', 'f()', 'y'],
+    ['VAR x = 1', 'FUN f() -> VAR x = x + 1', 'f()', 'x'], ['FUN f() -> VAR x = x + 1', 'f()'],
+    ['VAR z = 7', 'FUN o() -> (FUN i() -> IF z == 7 THEN VAR z = 1 ELSE 9)()', 'o()'],
+
+    # Scoping is dynamic: callers' variables are visible, not those of the defining call
+    ['FUN f() -> a + 1', 'FUN g(a) -> f()', 'g(1)', 'f()'], ['FUN mk(n) -> FUN (x) -> x + n', 'VAR h = mk(3)', 'h(4)'],
+    ['FUN t(b) -> u()', 'FUN u() -> VAR c = b * q', 'FUN v(q) -> t(q + 1)', 'v(4)', 'c'],
+    ['FUN f2(n) -> IF n == 0 THEN k ELSE f2(n - 1)', 'FUN g2(k) -> f2(3)', 'g2(9)'],
+    ['FUN b1(x) -> IF x THEN c1(x + 1) ELSE 0', 'FUN c1(z) -> x + z', 'b1(5)', 'c1(1)'],
+
+    # Deep expressions
+    ['1' + ' + 1' * 3000], ['1 + (' * 1500 + '1' + ')' * 1500], ['NOT (' * 1500 + '0' + ')' * 1500],
+    ['VAR n = 2', '(n - (' * 300 + 'n' + ')' * 300 + ') * 1'],
+
+    # Arrays and parallel_map, in process
+    ['parallel_map(FUN (x) -> x * 2, array_range(0, 10))'], ['parallel_map(FUN (x) -> "s", array_range(0, 3))'],
+]
+
+LEXERS = tuple(my_own.LEXERS)
+OPTIMIZATIONS = (0, 2)
+
+
+def run_program(lines, engine='tree', lexer='table', optimize=0, **options):
+    '''(value repr, error text, printed output) of each line'''
+    symbol_table = my_own.new_globals()
+    outcomes = []
+    for line in lines:
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            if lexer == 'table':
+                value, error = my_own.run('<test>', line, engine, optimize, use_cache=False, symbol_table=symbol_table, **options)
+            else:
+                value, error = run_with_lexer(line, engine, lexer, optimize, symbol_table)
+        outcomes.append((repr(value), error.as_string() if error else None, output.getvalue()))
+    return outcomes
+
+def run_with_lexer(text, engine, lexer, optimize, symbol_table):
+    '''my_own.run() with another lexer than the table one'''
+    try:
+        program = my_own.load_program('<test>', text, optimize, lexer)
+        context = Context('<program>')
+        context.symbol_table = symbol_table
+        context.options = RunOptions(workers=1)
+        return my_own.execute(program.ast, context, engine), None
+    except ErrorSignal as signal:
+        return None, signal.error
+
+
+### DIFFERENTIAL ###
+
+class DifferentialTest(unittest.TestCase):
+    def test_engines_lexers_and_optimizations_agree(self):
+        for lines in CORPUS:
+            expected = run_program(lines, workers=1)
+            for engine in my_own.ENGINES:
+                for lexer in LEXERS:
+                    for optimize in OPTIMIZATIONS:
+                        with self.subTest(lines=lines[-1][:60], engine=engine, lexer=lexer, optimize=optimize):
+                            self.assertEqual(run_program(lines, engine, lexer, optimize, workers=1), expected)
+
+
+### REGRESSIONS ###
+
+class RegressionTest(unittest.TestCase):
+    def test_run_file_ignores_trailing_newline(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.myown', delete=False) as file:
+            file.write('1 + 2\n')
+        try:
+            self.assertEqual(repr(my_own.run_file(file.name)), '(3, None)')
+        finally:
+            os.remove(file.name)
+
+    def test_optimizer_measures_string_repeats_before_folding(self):
+        report = []
+        self.assertEqual(repr(my_own.run('<test>', 'IF 0 THEN "ab" * 200000000 ELSE 1', optimize=2, report=report)), '(1, None)')
+        self.assertEqual(report, [])
+
+    def test_optimizer_measures_int_powers_before_folding(self):
+        for text in ('IF 0 THEN 10 ^ 10 ^ 10 ELSE 1', 'IF 0 THEN 3 ^ 100000 * 7 ^ 100000 ELSE 1'):
+            for optimize in (1, 2):
+                with self.subTest(text=text, optimize=optimize):
+                    self.assertEqual(repr(my_own.run('<test>', text, optimize=optimize)), '(1, None)')
+        report = []
+        my_own.run('<test>', 'IF 0 THEN 2 ^ 10000000000 ELSE 1', optimize=1, report=report)
+        self.assertEqual(report, [])
+
+    def test_illegal_operations_point_at_the_left_operand(self):
+        for text, arrows in (('"a" - 1', '^^^'), ('1 + "s"', '^'), ('(1 + 2) * (3 - "x")', ' ' * 11 + '^')):
+            for engine in my_own.ENGINES:
+                with self.subTest(text=text, engine=engine):
+                    error = my_own.run('<test>', text, engine)[1]
+                    self.assertTrue(error.as_string().endswith(f'\n {text}\n {arrows}'), error.as_string())
+
+    def test_tracebacks_keep_tail_calls(self):
+        lines = ['FUN loop(n) -> IF n == 0 THEN 1 / 0 ELSE loop(n - 1)', 'FUN a(n) -> b(n)', 'FUN b(n) -> 1 + loop(n)']
+        for n, shown in ((3, 3), (50, utils.TAIL_CALLS_SHOWN)):
+            for engine in my_own.ENGINES:
+                with self.subTest(n=n, engine=engine):
+                    traceback = run_program(lines + [f'a({n})'], engine)[-1][1]
+                    self.assertEqual(traceback.count(' in a\n'), 1)
+                    self.assertEqual(traceback.count(' in b\n'), 1)
+                    self.assertEqual(traceback.count(' in loop\n'), shown + 1)
+                    self.assertEqual(f'... {n - shown} earlier tail calls' in traceback, n > shown)
+
+    def test_input_int_reads_again_after_a_bad_line(self):
+        with mock.patch('builtins.input', side_effect=['x', '21']), contextlib.redirect_stdout(io.StringIO()) as output:
+            value, error = my_own.run('<test>', 'input_int() * 2', use_cache=False)
+        self.assertEqual((repr(value), error), ('42', None))
+        self.assertEqual(output.getvalue(), "'x' must be an integer. Try again!\n")
+        self.assertEqual(my_own.run('<test>', 'input_int(1)')[1].details, "'input_int' expected 0 args, but received 1")
+
+    def test_vectorizer_skips_bodies_without_allocating(self):
+        program = my_own.load_program('<test>', 'FOR i = 0 TO 1000000000 THEN print(i)')
+        self.assertIs(type(program.ast), ForNode)
+        self.assertEqual(vectorize.scalar_start(program.ast, range(0, 1000000000), None), 0)
+
+        with contextlib.redirect_stdout(io.StringIO()):
+            value, error = my_own.run('<test>', 'FOR i = 0 TO 1000000000 THEN print(i)', fuel=5)
+        self.assertEqual(error.error_name, 'Limit Exceeded')
+
+    def test_vectorizer_finds_errors_past_the_first_chunk(self):
+        text = f'FOR i = 0 TO {vectorize.CHUNK * 3} THEN VAR y = 1 / (i - {vectorize.CHUNK * 2 + 5})'
+        program = my_own.load_program('<test>', text)
+        indices = range(0, vectorize.CHUNK * 3)
+        if vectorize.numpy is not None:
+            self.assertEqual(vectorize.scalar_start(program.ast, indices, None), vectorize.CHUNK * 2 + 4)
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(my_own.run('<test>', text, engine)[1].details, 'Division by zero')
+
+    def test_limits_dont_depend_on_numpy(self):
+        program = my_own.load_program('<test>', 'FOR i = 0 TO 100000 THEN VAR y = i * i - 3 * i')
+        self.assertEqual(vectorize.scalar_start(program.ast, range(0, 100000), None, Meter(1000)), 0)
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                value, error = my_own.run('<test>', 'FOR i = 0 TO 100000 THEN VAR y = i * i - 3 * i', engine, fuel=1000)
+                self.assertEqual(error.error_name, 'Limit Exceeded')
+
+    def test_negative_fuel_is_rejected(self):
+        with self.assertRaises(ValueError): my_own.run('<test>', 'WHILE 1 THEN 0', 'vm', fuel=-1)
+        self.assertEqual(my_own.run('<test>', 'WHILE 1 THEN 0', 'vm', fuel=0)[1].error_name, 'Limit Exceeded')
+
+    def test_parallel_map_sends_deep_functions(self):
+        lines = ['FUN big(x) -> x' + ' + 1' * 3000, 'parallel_map(big, array_range(0, 4))',
+                 'parallel_map(FUN (x) -> x' + ' * 1' * 3000 + ', array_range(0, 2' + ' * 1' * 3000 + '))']
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                in_process = run_program(lines, engine, workers=1)
+                self.assertEqual([value for value, _, _ in in_process[1:]], ['[3000, 3001, 3002, 3003]', '[0, 1]'])
+                self.assertEqual(run_program(lines, engine, workers=2), in_process)
+
+    def test_parallel_map_runs_the_same_programs_with_any_workers(self):
+        lines = ['FUN w(k2) -> parallel_map(FUN (x) -> x * k2, array_range(0, 10))', 'w(2)']
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                in_process = run_program(lines, engine, workers=1)
+                self.assertIsNotNone(in_process[-1][1])
+                self.assertEqual(run_program(lines, engine, workers=2), in_process)
+
+    def test_profiler_counts_every_iteration(self):
+        profiler = Profiler()
+        my_own.run('<test>', 'FOR i = 0 TO 1000 THEN VAR y = (i + 1) * 2 + 1', profile=profiler)
+        stats = profiler.node_stats()
+        self.assertEqual([entry['count'] for entry in stats], [1000] * 4)
+
+        # Nested operators starting at the same position have different spans
+        spans = {(entry['line'], entry['column'], entry['end_line'], entry['end_column']) for entry in stats}
+        self.assertEqual(len(spans), len(stats))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,54 @@
+'''
+Every run gets its own globals over the shared, frozen builtins. From the
+repository root:
+
+    python -m unittest discover tests
+'''
+import threading
+import unittest
+
+import my_own
+
+
+class GlobalsTest(unittest.TestCase):
+    def test_runs_dont_see_each_others_vars(self):
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual(repr(my_own.run('<test>', 'VAR leak = 1', engine)[0]), '1')
+                self.assertEqual(my_own.run('<test>', 'leak', engine)[1].details, "'leak' is not defined")
+
+    def test_builtins_stay_the_same(self):
+        builtins = dict(my_own.builtin_symbol_table.symbols)
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                for text in ('VAR print = 1', 'VAR len = FUN (x) -> 0', 'FUN null() -> 1', 'FOR True = 0 TO 2 THEN 0'):
+                    self.assertIsNone(my_own.run('<test>', text, engine)[1])
+                self.assertEqual(repr(my_own.run('<test>', 'len("abc") + True', engine)[0]), '4')
+        self.assertEqual(my_own.builtin_symbol_table.symbols, builtins)
+        with self.assertRaises(TypeError): my_own.builtin_symbol_table.set('print', None)
+
+    def test_shared_table_keeps_vars(self):
+        symbol_table = my_own.new_globals()
+        my_own.run('<test>', 'VAR print = 2', symbol_table=symbol_table)
+        self.assertEqual(repr(my_own.run('<test>', 'print * 3', symbol_table=symbol_table)[0]), '6')
+        self.assertEqual(set(symbol_table.symbols), {'print'})
+
+    def test_threads(self):
+        results = {}
+        def worker(n):
+            outcomes = []
+            for _ in range(50):
+                my_own.run('<test>', f'VAR mine = {n}')
+                outcomes.append(my_own.run('<test>', 'mine')[1] is not None)
+            symbol_table = my_own.new_globals()
+            my_own.run('<test>', f'VAR mine = {n}', symbol_table=symbol_table)
+            results[n] = (all(outcomes), repr(my_own.run('<test>', 'mine * 1', symbol_table=symbol_table)[0]))
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        self.assertEqual(results, {n: (True, str(n)) for n in range(8)})
+
+
+if __name__ == '__main__':
+    unittest.main()
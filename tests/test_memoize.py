@@ -0,0 +1,71 @@
+'''
+run(..., memoize=N): pure functions cache their results, programs must give
+the same values, errors and output with or without it. From the repository
+root:
+
+    python -m unittest discover tests
+'''
+import unittest
+
+import my_own
+from test_engines import CORPUS, run_program
+
+
+# Functions whose result depends on what the names they call are bound to
+REBINDING = [
+    ['FUN sq(x) -> x * x', 'FUN h(x) -> sq(x) + 1', 'h(2)', 'FUN k(sq) -> h(2) + 0', 'k(FUN (x) -> 100)', 'h(2)'],
+    ['FUN sq(x) -> x * x', 'FUN h(x) -> sq(x) + 1', 'h(2)', 'FUN sq(x) -> x', 'h(2)'],
+    ['FUN one(x) -> two(x)', 'FUN two(x) -> three(x) * 2', 'FUN three(x) -> x + 1', 'one(1)',
+     'FUN k(three) -> one(1)', 'k(FUN (x) -> x - 1)', 'one(1)'],
+    ['FUN h(x) -> sq(x)', 'h(3)', 'FUN sq(x) -> x * x', 'h(3)', 'FUN m(x) -> h(x) + h(x)', 'm(3)'],
+    ['FUN p(x) -> print_ret(x)', 'p(1)', 'p(1)'], ['FUN s(x) -> print(x)', 's(1)', 's(1)'],
+    ['FUN f(x) -> g(x)', 'FUN g(x) -> x * 2', 'FUN w(g) -> f(3)', 'w(FUN (y) -> y)', 'f(3)'],
+]
+
+MEMOIZED = 10
+
+
+class MemoizeTest(unittest.TestCase):
+    def test_same_outcomes_with_and_without_memoization(self):
+        for lines in CORPUS + REBINDING:
+            expected = run_program(lines, workers=1)
+            for engine in my_own.ENGINES:
+                with self.subTest(lines=lines[-1][:60], engine=engine):
+                    self.assertEqual(run_program(lines, engine, memoize=MEMOIZED, workers=1), expected)
+
+    def test_rebound_callee_isnt_served_from_the_cache(self):
+        lines = REBINDING[0]
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                self.assertEqual([value for value, _, _ in run_program(lines, engine, memoize=MEMOIZED)][-2:], ['101', '5'])
+
+    def test_results_are_cached(self):
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                symbol_table = my_own.new_globals()
+                my_own.run('<test>', 'FUN fib(n) -> IF n < 2 THEN n ELSE fib(n - 1) + fib(n - 2)', engine,
+                           memoize=200, symbol_table=symbol_table)
+                value, error = my_own.run('<test>', 'fib(80)', engine, memoize=200, symbol_table=symbol_table)
+                self.assertEqual(repr(value), '23416728348467685')
+
+                stats = symbol_table.get('fib').memo.stats()
+                self.assertEqual((stats['size'], stats['misses']), (81, 81))
+
+    def test_impure_functions_have_no_cache(self):
+        for text in ('FUN f(x) -> VAR y = x', 'FUN f(x) -> y', 'FUN f(x) -> FUN (y) -> y',
+                     'FUN f(x) -> x(1)', 'FUN f(x) -> FOR i = 0 TO x THEN i'):
+            with self.subTest(text=text):
+                self.assertIsNone(my_own.run('<test>', text, memoize=MEMOIZED)[0].memo)
+
+    def test_tail_calls_arent_cached(self):
+        for engine in my_own.ENGINES:
+            with self.subTest(engine=engine):
+                symbol_table = my_own.new_globals()
+                for line in ('FUN sq(x) -> x * x', 'FUN t(x) -> sq(x)', 't(3)', 't(3)'):
+                    my_own.run('<test>', line, engine, memoize=MEMOIZED, symbol_table=symbol_table)
+                self.assertEqual(symbol_table.get('t').memo.stats()['hits'], 1)
+                self.assertEqual(len(symbol_table.get('sq').memo), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+'''
+run(..., stream=True): the parser pulls tokens from the lexer as it goes.
+From the repository root:
+
+    python -m unittest discover tests
+'''
+import unittest
+
+import my_own
+from classes.error import ErrorSignal
+from test_engines import CORPUS, run_program
+
+
+def load_error(text, stream, lexer):
+    '''(error name, span) of load_program(), None when the program loads'''
+    try:
+        my_own.load_program('<test>', text, lexer=lexer, stream=stream)
+    except ErrorSignal as signal:
+        return signal.error.error_name, signal.error.pos_start, signal.error.pos_end
+    return None
+
+
+class StreamTest(unittest.TestCase):
+    def test_corpus_runs_the_same(self):
+        for lines in CORPUS:
+            with self.subTest(lines=lines[-1][:60]):
+                self.assertEqual(run_program(lines, stream=True), run_program(lines))
+
+    def test_programs_come_back_without_tokens(self):
+        for lexer in my_own.LEXERS:
+            with self.subTest(lexer=lexer):
+                self.assertIsNone(my_own.load_program('<test>', '1 + 2', lexer=lexer, stream=True).tokens)
+                self.assertEqual(len(my_own.load_program('<test>', '1 + 2', lexer=lexer).tokens), 4)
+
+    def test_syntax_errors_before_illegal_characters(self):
+        # The scan stops at the syntax error, the illegal character is never reached
+        for lexer in my_own.LEXERS:
+            with self.subTest(lexer=lexer):
+                self.assertEqual(load_error('1 + ) $', True, lexer), ('Invalid Syntax', 4, 5))
+                self.assertEqual(load_error('1 + ) $', False, lexer), ('Illegal Character', 6, 7))
+                self.assertEqual(load_error('1 2 $', True, lexer), ('Invalid Syntax', 2, 3))
+
+    def test_error_positions(self):
+        for text in ('VAR a = 1 + (2 * 3', '1 $ 2', '1 +', 'FUN f(a,', '(1'):
+            for lexer in my_own.LEXERS:
+                with self.subTest(text=text, lexer=lexer):
+                    self.assertIsNotNone(load_error(text, False, lexer))
+                    self.assertEqual(load_error(text, True, lexer), load_error(text, False, lexer))
+
+
+if __name__ == '__main__':
+    unittest.main()
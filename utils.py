@@ -1,22 +1,28 @@
-def string_with_arrows(text, pos_start, pos_end):
+from collections import deque
+
+def string_with_arrows(source, pos_start, pos_end):
+    '''pos_start and pos_end are offsets, their lines and columns come from the source's line index'''
     result = ''
+    text = source.text
+    ln_start, col_start = source.line_col(pos_start)
+    ln_end, col_end     = source.line_col(pos_end)
 
     # Calculate indices
-    idx_start = max(text.rfind('\n', 0, pos_start.idx), 0)
+    idx_start = max(text.rfind('\n', 0, pos_start), 0)
     idx_end = text.find('\n', idx_start + 1)
     if idx_end < 0: idx_end = len(text)
     
     # Generate each line
-    line_count = pos_end.ln - pos_start.ln + 1
+    line_count = ln_end - ln_start + 1
     for i in range(line_count):
         # Calculate line columns
         line = text[idx_start:idx_end]
-        col_start = pos_start.col if i == 0 else 0
-        col_end = pos_end.col if i == line_count - 1 else len(line) - 1
+        col_from = col_start if i == 0 else 0
+        col_to = col_end if i == line_count - 1 else len(line) - 1
 
         # Append to result
         result += line + '\n'
-        result += ' ' * (col_start + 1) + '^' * (col_end - col_start)
+        result += ' ' * (col_from + 1) + '^' * (col_to - col_from)
 
         # Re-calculate indices
         idx_start = idx_end
@@ -29,15 +35,20 @@ def string_with_arrows(text, pos_start, pos_end):
 ### SYMBOLTABLE ###
 
 class SymbolTable:
+    __slots__ = ('symbols', 'parent')
+
     def __init__(self, parent=None):
         self.symbols = {}
         self.parent = parent
 
     def get(self, name):
-        value = self.symbols.get(name, None)
-        if value == None and self.parent:
-            return self.parent.get(name)
-        return value
+        # Walks the parents in a loop, deep call chains would overflow python's stack otherwise
+        table = self
+        while table:
+            value = table.symbols.get(name, None)
+            if value != None: return value
+            table = table.parent
+        return None
 
     def set(self, name, value):
         self.symbols[name] = value
@@ -45,12 +56,71 @@ class SymbolTable:
     def remove(self, name):
         del self.symbols[name]
 
+
+class FrozenSymbolTable(SymbolTable):
+    '''Read only table, shared as the parent of many others (the builtins under every run's globals)'''
+    __slots__ = ()
+
+    def __init__(self, symbols, parent=None):
+        super().__init__(parent)
+        self.symbols = dict(symbols)
+
+    def set(self, name, value):
+        raise TypeError(f"Can't set '{name}', the symbol table is frozen")
+
+    def remove(self, name):
+        raise TypeError(f"Can't remove '{name}', the symbol table is frozen")
+
+### FRAME ###
+
+class Frame:
+    '''Fixed size list of slots for a function call, addressed by the Resolver'''
+    __slots__ = ('slots', 'names', 'rest')
+
+    def __init__(self, names, rest=None):
+        self.slots = [None] * len(names)
+        self.names = names # Name -> slot, shared by the calls of a function
+        self.rest  = rest  # Name -> value, variables of the functions that tail called this one
+
 ### CONTEXT ###
 
+class RunOptions:
+    '''Settings of one run, shared by every context of the run'''
+    __slots__ = ('memoize', 'workers', 'read_line', 'meter')
+
+    def __init__(self, memoize=0, workers=None, read_line=None, meter=None):
+        self.memoize = memoize # Result cache capacity of each pure function (0 = off)
+        self.workers = workers # Processes used by parallel_map (None = one per cpu)
+        self.read_line = read_line # Coroutine function giving input lines under run_async()
+        self.meter = meter # Fuel and deadline (classes/meter.py), None = no limits
+
+    def __reduce__(self):
+        # Sent to parallel_map workers, read_line belongs to this process' event
+        # loop. Each worker gets its own copy of the meter as it is now
+        return (RunOptions, (self.memoize, self.workers, None, self.meter))
+
+
+# Functions of a chain of tail calls kept for tracebacks, the others are only counted
+TAIL_CALLS_SHOWN = 10
+
 class Context:
-    def __init__(self, display_name, parent=None, parent_entry_pos=None):
+    __slots__ = ('display_name', 'parent', 'parent_entry_node', 'symbol_table', 'frame', 'options',
+                 'tail_calls', 'tail_call_count')
+
+    def __init__(self, display_name, parent=None, parent_entry_node=None):
         self.display_name = display_name
         self.parent = parent
-        self.parent_entry_pos = parent_entry_pos
+        self.parent_entry_node = parent_entry_node # The CallNode that created it
         self.symbol_table = None
+        self.frame = None
+        self.options = parent.options if parent else None
+        self.tail_calls = None # (display_name, CallNode) of the functions that tail called into this context
+        self.tail_call_count = 0
+
+    def tail_call(self, display_name, node):
+        '''The function running in this context makes a tail call at node to display_name'''
+        if self.tail_calls is None: self.tail_calls = deque(maxlen=TAIL_CALLS_SHOWN)
+        self.tail_calls.append((self.display_name, node))
+        self.tail_call_count += 1
+        self.display_name = display_name
 